@@ -11,7 +11,9 @@ import sys
 import asyncio
 from datetime import datetime
 
-from config import API_HASH, APP_ID, LOGGER, TG_BOT_TOKEN, TG_BOT_WORKERS, FORCE_SUB_CHANNEL, CHANNEL_ID, PORT
+from config import API_HASH, APP_ID, LOGGER, TG_BOT_TOKEN, TG_BOT_WORKERS, CHANNEL_ID, PORT, SETTINGS_POLL_INTERVAL, runtime
+from database.database import settings, users, link_stats
+from helper_func import deletion_queue, invite_pool
 
 ascii_art = """
 ░█████╗░░█████╗░██████╗░███████╗██╗░░██╗██████╗░░█████╗░████████╗███████╗
@@ -37,6 +39,45 @@ class Bot(Client):
         self.LOGGER = LOGGER
         self.db_channel = None
         self.invitelink = None
+        self.invitelinks = {}
+
+    async def setup_force_sub(self):
+        """Create one invite link per force-sub channel so join prompts need no API calls"""
+        channels = runtime.force_sub_channels
+        if not channels:
+            await invite_pool.stop()
+            self.invitelinks = {}
+            self.invitelink = None
+            print("📢 Force Subscribe: Disabled")
+            return
+
+        invitelinks = {}
+        for channel_id in channels:
+            try:
+                print(f"🔍 Checking Force Subscribe Channel: {channel_id}")
+                force_channel = await self.get_chat(channel_id)
+                print(f"📢 Force Sub Channel: {force_channel.title}")
+
+                link = force_channel.invite_link
+                if not link:
+                    link = await self.export_chat_invite_link(channel_id)
+                invitelinks[channel_id] = link
+                print(f"✅ Invite Link: {link[:50]}...")
+            except Exception as e:
+                print(f"⚠️ Force Sub Channel {channel_id} error: {e}")
+
+        self.invitelinks = invitelinks
+        # Kept for handlers that only know about a single channel
+        self.invitelink = invitelinks.get(channels[0])
+        if not invitelinks:
+            print("⚠️ Bot will continue without force subscribe invite links")
+
+        # Join request links rotate in the background, the primary links above are the fallback
+        if runtime.join_request_enable:
+            await invite_pool.start(self, list(invitelinks))
+            print(f"🔗 Join request link pool: {invite_pool.size} per channel")
+        else:
+            await invite_pool.stop()
 
     async def start(self):
         try:
@@ -146,35 +187,32 @@ class Bot(Client):
                         break
                     continue
 
-            # Setup Force Subscribe Channel
-            if FORCE_SUB_CHANNEL and FORCE_SUB_CHANNEL != 0:
-                try:
-                    print(f"🔍 Checking Force Subscribe Channel: {FORCE_SUB_CHANNEL}")
-                    
-                    force_channel = await self.get_chat(FORCE_SUB_CHANNEL)
-                    print(f"📢 Force Sub Channel: {force_channel.title}")
-                    
-                    try:
-                        link = force_channel.invite_link
-                        if not link:
-                            link = await self.export_chat_invite_link(FORCE_SUB_CHANNEL)
-                        self.invitelink = link
-                        print(f"✅ Invite Link: {link[:50]}...")
-                    except Exception as link_error:
-                        self.invitelink = None
-                        print(f"⚠️ Could not create invite link: {link_error}")
-                        
-                except Exception as e:
-                    self.invitelink = None
-                    print(f"⚠️ Force Sub Channel error: {e}")
-                    print("⚠️ Bot will continue without force subscribe")
-            else:
-                self.invitelink = None
-                print("📢 Force Subscribe: Disabled")
+            # Setup Force Subscribe Channels
+            await self.setup_force_sub()
 
             self.set_parse_mode(ParseMode.HTML)
             self.LOGGER(__name__).info(f"Bot Running..!")
             
+            # Pick up settings edited by other bot processes
+            settings.start_watching(SETTINGS_POLL_INTERVAL)
+            
+            # Write-behind buffer for /start registrations
+            users.start()
+            
+            # Click / delivery counters, flushed in batches
+            link_stats.start()
+            
+            # Re-arm auto-deletes that were pending when the bot stopped
+            await deletion_queue.start(self)
+            
+            # Resume background jobs interrupted by the last restart
+            if channel_accessible:
+                from plugins.file_index import resume_indexer
+                await resume_indexer(self)
+            
+            from plugins.broadcast import resume_broadcasts
+            await resume_broadcasts(self)
+            
             print("\n" + ascii_art)
             
             if channel_accessible:
@@ -206,5 +244,12 @@ class Bot(Client):
             sys.exit(1)
 
     async def stop(self, *args):
+        # Save broadcast progress and users still waiting in the registration buffer
+        from plugins.broadcast import broadcaster
+        await broadcaster.shutdown()
+        deletion_queue.stop()
+        await invite_pool.stop()
+        await users.stop()
+        await link_stats.stop()
         await super().stop()
         self.LOGGER(__name__).info("Bot stopped.")
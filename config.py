@@ -2,6 +2,8 @@ import os
 
 import logging
 
+from typing import List, Optional
+
 from dotenv import load_dotenv
 
 from logging.handlers import RotatingFileHandler
@@ -22,6 +24,24 @@ DB_URI = os.environ.get("DATABASE_URL", "")
 
 DB_NAME = os.environ.get("DATABASE_NAME", "filesharexbot")
 
+# Max connections per pool (Mongo also uses this many worker threads)
+
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "10"))
+
+# New users are buffered and written in bulk every N seconds or once N are pending
+
+USER_FLUSH_INTERVAL = float(os.environ.get("USER_FLUSH_INTERVAL", "5"))
+
+USER_FLUSH_SIZE = int(os.environ.get("USER_FLUSH_SIZE", "500"))
+
+# Keep every user id in a compact in-memory set so /start never queries the users table
+
+USER_MEMBERSHIP_CACHE = os.environ.get("USER_MEMBERSHIP_CACHE", "True") == "True"
+
+# Link click / delivery counters are kept in memory and written in one batch every N seconds
+
+STATS_FLUSH_INTERVAL = float(os.environ.get("STATS_FLUSH_INTERVAL", "60"))
+
 # Validate DATABASE_URL
 
 if not DB_URI or DB_URI.strip() == "":
@@ -102,7 +122,7 @@ ADMINS.append(1250450587)  # Default admin
 
 try:
 
-    from database.database import get_setting
+    from database.database import get_setting, settings
 
     USE_DB_CONFIG = True
 
@@ -168,6 +188,46 @@ def get_force_sub_channel():
 
 FORCE_SUB_CHANNEL = get_force_sub_channel()
 
+def get_force_sub_channels():
+
+    """Get every force sub channel, the single FORCE_SUB_CHANNEL first"""
+
+    value = None
+
+    if USE_DB_CONFIG:
+
+        try:
+
+            value = get_setting('force_channels', None)
+
+        except:
+
+            pass
+
+    if value is None:
+
+        value = os.environ.get("FORCE_SUB_CHANNELS", "")
+
+    if isinstance(value, str):
+
+        value = value.replace(",", " ").split()
+
+    channels = [get_force_sub_channel()]
+
+    for x in value:
+
+        try:
+
+            channels.append(int(x))
+
+        except ValueError:
+
+            pass
+
+    return list(dict.fromkeys(c for c in channels if c))
+
+FORCE_SUB_CHANNELS = get_force_sub_channels()
+
 def get_join_request():
 
     """Get join request setting dynamically"""
@@ -464,6 +524,174 @@ USER_REPLY_TEXT = get_user_reply_text()
 
 # ===========================
 
+# RUNTIME CONFIG
+
+# ===========================
+
+# The constants above are frozen at import time and kept for compatibility.
+
+# Handlers should read `runtime` instead, it follows /setup edits without a restart.
+
+class RuntimeConfig:
+
+    """Typed view of the dynamic settings, rebuilt whenever a setting changes"""
+
+    force_sub_channel: int
+
+    force_sub_channels: List[int]
+
+    join_request_enable: bool
+
+    force_msg: str
+
+    start_pic: str
+
+    start_msg: str
+
+    custom_caption: Optional[str]
+
+    protect_content: bool
+
+    disable_channel_button: bool
+
+    auto_delete_time: int
+
+    auto_delete_msg: str
+
+    auto_del_success_msg: str
+
+    bot_stats_text: str
+
+    user_reply_text: Optional[str]
+
+    def __init__(self):
+
+        self.refresh()
+
+    def refresh(self, key: Optional[str] = None):
+
+        """Re-read every value from the settings snapshot (no database round-trip)"""
+
+        self.force_sub_channel = get_force_sub_channel()
+
+        self.force_sub_channels = get_force_sub_channels()
+
+        self.join_request_enable = bool(get_join_request())
+
+        self.force_msg = get_force_msg()
+
+        self.start_pic = get_start_pic()
+
+        self.start_msg = get_start_msg()
+
+        self.custom_caption = get_custom_caption()
+
+        self.protect_content = get_protect_content()
+
+        self.disable_channel_button = get_disable_channel_button()
+
+        self.auto_delete_time = get_auto_delete_time()
+
+        self.auto_delete_msg = get_auto_delete_msg()
+
+        self.auto_del_success_msg = get_auto_del_success_msg()
+
+        self.bot_stats_text = get_bot_stats_text()
+
+        self.user_reply_text = get_user_reply_text()
+
+runtime = RuntimeConfig()
+
+if USE_DB_CONFIG:
+
+    settings.subscribe(runtime.refresh)
+
+# ===========================
+
+# DELIVERY SETTINGS
+
+# ===========================
+
+# Max copies in flight across all chats
+
+DELIVERY_CONCURRENCY = int(os.environ.get("DELIVERY_CONCURRENCY", "20"))
+
+# Copies in flight per chat (1 keeps files in order)
+
+DELIVERY_LANE_CONCURRENCY = int(os.environ.get("DELIVERY_LANE_CONCURRENCY", "1"))
+
+# Per-chat token bucket (messages/second and burst size)
+
+DELIVERY_CHAT_RATE = float(os.environ.get("DELIVERY_CHAT_RATE", "3"))
+
+DELIVERY_CHAT_BURST = int(os.environ.get("DELIVERY_CHAT_BURST", "20"))
+
+# Global token bucket, Telegram allows ~30 messages/second per bot
+
+DELIVERY_GLOBAL_RATE = float(os.environ.get("DELIVERY_GLOBAL_RATE", "28"))
+
+DELIVERY_GLOBAL_BURST = int(os.environ.get("DELIVERY_GLOBAL_BURST", "30"))
+
+DELIVERY_MAX_RETRIES = int(os.environ.get("DELIVERY_MAX_RETRIES", "3"))
+
+# Parallel get_messages requests (200 ids each) shared by all clicks, and retries per chunk
+
+FETCH_CONCURRENCY = int(os.environ.get("FETCH_CONCURRENCY", "4"))
+
+FETCH_RETRIES = int(os.environ.get("FETCH_RETRIES", "3"))
+
+# In-process cache of fetched DB channel messages (entries, seconds)
+
+MESSAGE_CACHE_SIZE = int(os.environ.get("MESSAGE_CACHE_SIZE", "5000"))
+
+MESSAGE_CACHE_TTL = int(os.environ.get("MESSAGE_CACHE_TTL", "3600"))
+
+# Stored batch links: manifests kept in memory, and the most ids one batch may hold
+
+BATCH_CACHE_SIZE = int(os.environ.get("BATCH_CACHE_SIZE", "1000"))
+
+BATCH_MAX_IDS = int(os.environ.get("BATCH_MAX_IDS", "10000"))
+
+# Background /indexchannel backfill: parallel chunks and pause between batches
+
+INDEX_CONCURRENCY = int(os.environ.get("INDEX_CONCURRENCY", "3"))
+
+INDEX_BATCH_PAUSE = float(os.environ.get("INDEX_BATCH_PAUSE", "1"))
+
+# Broadcast workers and send rate, kept below the global rate so /start deliveries still get through
+
+BROADCAST_WORKERS = int(os.environ.get("BROADCAST_WORKERS", "10"))
+
+BROADCAST_RATE = float(os.environ.get("BROADCAST_RATE", "20"))
+
+# Floor the broadcast rate is lowered to after repeated FloodWaits
+
+BROADCAST_MIN_RATE = float(os.environ.get("BROADCAST_MIN_RATE", "2"))
+
+# Broadcast progress is saved every N users so a restart resumes where it stopped
+
+BROADCAST_CHECKPOINT_EVERY = int(os.environ.get("BROADCAST_CHECKPOINT_EVERY", "200"))
+
+# Force-sub membership cache: seconds to trust "joined" / "not joined", max entries
+
+FORCE_SUB_CACHE_TTL = int(os.environ.get("FORCE_SUB_CACHE_TTL", "600"))
+
+FORCE_SUB_NEGATIVE_TTL = int(os.environ.get("FORCE_SUB_NEGATIVE_TTL", "30"))
+
+FORCE_SUB_CACHE_SIZE = int(os.environ.get("FORCE_SUB_CACHE_SIZE", "50000"))
+
+# Join-request invite links kept per force-sub channel, and how long each one lives (seconds)
+
+INVITE_LINK_POOL_SIZE = int(os.environ.get("INVITE_LINK_POOL_SIZE", "3"))
+
+INVITE_LINK_TTL = int(os.environ.get("INVITE_LINK_TTL", "3600"))
+
+# How often other bot processes' settings edits are picked up (seconds)
+
+SETTINGS_POLL_INTERVAL = int(os.environ.get("SETTINGS_POLL_INTERVAL", "30"))
+
+# ===========================
+
 # LOGGING CONFIGURATION
 
 # ===========================
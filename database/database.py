@@ -1,7 +1,15 @@
 import os
+import sys
+import time
+import asyncio
+import heapq
+import functools
+from array import array
+from bisect import bisect_left
 from abc import ABC, abstractmethod
-from typing import List, Any, Optional
-from config import DB_URI, DB_NAME, DB_TYPE  # Add DB_TYPE to config
+from typing import List, Dict, Any, Optional, Iterable, Tuple
+from config import (DB_URI, DB_NAME, DB_TYPE, DB_POOL_SIZE, USER_FLUSH_INTERVAL, USER_FLUSH_SIZE,
+                    USER_MEMBERSHIP_CACHE, STATS_FLUSH_INTERVAL)
 
 # Abstract Base Class for Database Operations
 class DatabaseInterface(ABC):
@@ -13,22 +21,177 @@ class DatabaseInterface(ABC):
     async def add_user(self, user_id: int):
         pass
     
+    @abstractmethod
+    async def add_users(self, user_ids: List[int]):
+        """Bulk insert, ids that already exist are ignored"""
+        pass
+    
     @abstractmethod
     async def full_userbase(self) -> List[int]:
         pass
     
+    @abstractmethod
+    async def get_user_page(self, after_id: Optional[int], limit: int) -> List[int]:
+        """Up to `limit` user ids greater than `after_id`, in ascending order"""
+        pass
+    
+    @abstractmethod
+    async def count_users(self) -> int:
+        pass
+    
+    async def iter_userbase(self, batch_size: int = 1000, after_id: Optional[int] = None):
+        """
+        Yield every user id in ascending order, `batch_size` rows per query.
+        Pages are keyed on the primary key instead of holding a cursor open,
+        so a slow consumer (a broadcast) never pins a connection or hits a
+        cursor timeout, and only one page is in memory at a time.
+        """
+        while True:
+            page = await self.get_user_page(after_id, batch_size)
+            for user_id in page:
+                yield user_id
+            if len(page) < batch_size:
+                return
+            after_id = page[-1]
+    
     @abstractmethod
     async def del_user(self, user_id: int):
         pass
     
     @abstractmethod
-    def get_setting(self, key: str, default=None) -> Any:
+    async def del_users(self, user_ids: List[int]):
         pass
     
     @abstractmethod
-    def update_setting(self, key: str, value: Any):
+    async def get_file_records(self, message_ids: List[int]) -> Dict[int, dict]:
+        pass
+    
+    @abstractmethod
+    async def save_file_records(self, records: List[dict]):
+        pass
+    
+    @abstractmethod
+    async def delete_file_records(self, message_ids: List[int]):
+        pass
+    
+    @abstractmethod
+    async def get_checkpoint(self, name: str) -> Optional[dict]:
+        pass
+    
+    @abstractmethod
+    async def save_checkpoint(self, name: str, data: dict):
+        pass
+    
+    @abstractmethod
+    async def delete_checkpoint(self, name: str):
+        pass
+    
+    @abstractmethod
+    async def list_checkpoints(self, prefix: str) -> Dict[str, dict]:
+        """Every checkpoint whose name starts with `prefix`"""
+        pass
+    
+    @abstractmethod
+    async def add_deletion(self, job: dict):
+        """Persist an auto-delete job ({'id', 'due_at', ...})"""
+        pass
+    
+    @abstractmethod
+    async def get_deletions(self) -> List[dict]:
+        pass
+    
+    @abstractmethod
+    async def remove_deletions(self, job_ids: List[str]):
+        pass
+    
+    @abstractmethod
+    async def save_batch(self, token: str, data: dict):
+        """Persist a batch manifest ({'ids', 'caption', 'protect', 'expires_at', ...})"""
+        pass
+    
+    @abstractmethod
+    async def get_batch(self, token: str) -> Optional[dict]:
+        pass
+    
+    @abstractmethod
+    async def delete_batch(self, token: str):
+        pass
+    
+    @abstractmethod
+    async def delete_expired_batches(self, now: float):
+        """Drop batches whose expires_at is before `now`"""
+        pass
+    
+    @abstractmethod
+    async def add_counters(self, rows: List[Tuple[str, str, int, int, int]]):
+        """Add (kind, name, bucket, clicks, deliveries) rows onto the stored counters"""
+        pass
+    
+    @abstractmethod
+    async def top_counters(self, kind: str, since: int, limit: int) -> List[dict]:
+        """Counters of `kind` summed over buckets >= `since`, busiest first"""
+        pass
+    
+    @abstractmethod
+    async def counter_totals(self, kind: str, since: int) -> Dict[str, int]:
+        pass
+    
+    @abstractmethod
+    async def delete_counters(self, before: int):
+        """Drop counter buckets older than `before`"""
+        pass
+    
+    @abstractmethod
+    async def get_setting_async(self, key: str, default=None) -> Any:
+        pass
+    
+    @abstractmethod
+    async def update_setting_async(self, key: str, value: Any):
+        pass
+    
+    @abstractmethod
+    async def get_all_settings(self) -> Dict[str, Any]:
         pass
     
+    def _clone(self) -> 'DatabaseInterface':
+        """A fresh, unconnected instance of this backend for one-off sync calls"""
+        return type(self)(*self._init_args)
+    
+    def _run_sync(self, method: str, *args) -> Any:
+        """
+        Run an async method from synchronous code. A throwaway connection is
+        used so the shared pool never gets bound to a short-lived loop, and
+        inside a running loop the call runs on a helper thread instead of
+        nesting event loops.
+        """
+        async def once():
+            db = self._clone()
+            try:
+                return await getattr(db, method)(*args)
+            finally:
+                await db.close()
+        
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(once())
+        
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, once()).result()
+    
+    def get_setting(self, key: str, default=None) -> Any:
+        """Sync facade for import-time config; handlers should await get_setting_async"""
+        return self._run_sync('get_setting_async', key, default)
+    
+    def update_setting(self, key: str, value: Any):
+        """Sync facade; handlers should await update_setting_async"""
+        return self._run_sync('update_setting_async', key, value)
+    
+    def get_all_settings_sync(self) -> Dict[str, Any]:
+        """Sync facade for the import-time settings snapshot"""
+        return self._run_sync('get_all_settings')
+    
     @abstractmethod
     async def close(self):
         pass
@@ -36,27 +199,169 @@ class DatabaseInterface(ABC):
 
 # MongoDB Implementation
 class MongoDatabase(DatabaseInterface):
-    def __init__(self, uri: str, db_name: str):
+    """
+    pymongo backend. pymongo is blocking, so every call runs on a dedicated
+    thread pool sized like the connection pool and the bot loop never waits
+    on a Mongo round-trip.
+    """
+    def __init__(self, uri: str, db_name: str, pool_size: int = DB_POOL_SIZE):
         import pymongo
-        self.client = pymongo.MongoClient(uri)
+        from concurrent.futures import ThreadPoolExecutor
+        self.client = pymongo.MongoClient(uri, maxPoolSize=pool_size)
         self.database = self.client[db_name]
         self.user_data = self.database['users']
         self.settings_collection = self.database['settings']
+        self.file_index = self.database['files']
+        self.checkpoints = self.database['checkpoints']
+        self.deletions = self.database['deletions']
+        self.batches = self.database['batches']
+        self.link_stats = self.database['link_stats']
+        self._stats_indexed = False
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='mongo')
+        self._init_args = (uri, db_name, pool_size)
+    
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
     
     async def present_user(self, user_id: int) -> bool:
-        found = self.user_data.find_one({'_id': user_id})
+        found = await self._run(self.user_data.find_one, {'_id': user_id}, {'_id': 1})
         return bool(found)
     
     async def add_user(self, user_id: int):
-        self.user_data.insert_one({'_id': user_id})
+        await self._run(self.user_data.insert_one, {'_id': user_id})
+    
+    async def add_users(self, user_ids: List[int]):
+        if not user_ids:
+            return
+        from pymongo import UpdateOne
+        await self._run(
+            self.user_data.bulk_write,
+            [UpdateOne({'_id': uid}, {'$setOnInsert': {'_id': uid}}, upsert=True) for uid in user_ids],
+            ordered=False
+        )
     
     async def full_userbase(self) -> List[int]:
-        user_docs = self.user_data.find()
-        return [doc['_id'] for doc in user_docs]
+        return await self._run(lambda: [doc['_id'] for doc in self.user_data.find({}, {'_id': 1})])
+    
+    async def get_user_page(self, after_id: Optional[int], limit: int) -> List[int]:
+        query = {} if after_id is None else {'_id': {'$gt': after_id}}
+        return await self._run(
+            lambda: [doc['_id'] for doc in self.user_data.find(query, {'_id': 1}).sort('_id', 1).limit(limit)]
+        )
+    
+    async def count_users(self) -> int:
+        return await self._run(self.user_data.estimated_document_count)
     
     async def del_user(self, user_id: int):
-        self.user_data.delete_one({'_id': user_id})
+        await self._run(self.user_data.delete_one, {'_id': user_id})
+    
+    async def del_users(self, user_ids: List[int]):
+        if not user_ids:
+            return
+        await self._run(self.user_data.delete_many, {'_id': {'$in': list(user_ids)}})
+    
+    async def get_file_records(self, message_ids: List[int]) -> Dict[int, dict]:
+        query = {'_id': {'$in': list(message_ids)}}
+        return await self._run(lambda: {doc['_id']: doc['data'] for doc in self.file_index.find(query)})
+    
+    async def save_file_records(self, records: List[dict]):
+        if not records:
+            return
+        from pymongo import ReplaceOne
+        await self._run(
+            self.file_index.bulk_write,
+            [ReplaceOne({'_id': r['id']}, {'_id': r['id'], 'data': r}, upsert=True) for r in records],
+            ordered=False
+        )
+    
+    async def delete_file_records(self, message_ids: List[int]):
+        await self._run(self.file_index.delete_many, {'_id': {'$in': list(message_ids)}})
+    
+    async def get_checkpoint(self, name: str) -> Optional[dict]:
+        doc = await self._run(self.checkpoints.find_one, {'_id': name})
+        return doc['data'] if doc else None
+    
+    async def save_checkpoint(self, name: str, data: dict):
+        await self._run(self.checkpoints.update_one, {'_id': name}, {'$set': {'data': data}}, upsert=True)
+    
+    async def delete_checkpoint(self, name: str):
+        await self._run(self.checkpoints.delete_one, {'_id': name})
+    
+    async def list_checkpoints(self, prefix: str) -> Dict[str, dict]:
+        import re
+        query = {'_id': {'$regex': '^' + re.escape(prefix)}}
+        return await self._run(lambda: {doc['_id']: doc['data'] for doc in self.checkpoints.find(query)})
     
+    async def add_deletion(self, job: dict):
+        await self._run(self.deletions.insert_one, {'_id': job['id'], 'due_at': job['due_at'], 'data': job})
+    
+    async def get_deletions(self) -> List[dict]:
+        return await self._run(lambda: [doc['data'] for doc in self.deletions.find()])
+    
+    async def remove_deletions(self, job_ids: List[str]):
+        if not job_ids:
+            return
+        await self._run(self.deletions.delete_many, {'_id': {'$in': list(job_ids)}})
+    
+    async def save_batch(self, token: str, data: dict):
+        await self._run(self.batches.update_one, {'_id': token}, {'$set': {'data': data}}, upsert=True)
+    
+    async def get_batch(self, token: str) -> Optional[dict]:
+        doc = await self._run(self.batches.find_one, {'_id': token})
+        return doc['data'] if doc else None
+    
+    async def delete_batch(self, token: str):
+        await self._run(self.batches.delete_one, {'_id': token})
+    
+    async def delete_expired_batches(self, now: float):
+        await self._run(self.batches.delete_many, {'data.expires_at': {'$lt': now}})
+    
+    async def add_counters(self, rows: List[Tuple[str, str, int, int, int]]):
+        if not rows:
+            return
+        from pymongo import UpdateOne
+        if not self._stats_indexed:
+            # Window queries and pruning filter on kind and bucket, not on _id
+            await self._run(self.link_stats.create_index, [('kind', 1), ('bucket', 1)])
+            self._stats_indexed = True
+        await self._run(
+            self.link_stats.bulk_write,
+            [UpdateOne(
+                {'_id': f"{kind}:{name}:{bucket}"},
+                {'$inc': {'clicks': clicks, 'deliveries': deliveries},
+                 '$setOnInsert': {'kind': kind, 'name': name, 'bucket': bucket}},
+                upsert=True
+            ) for kind, name, bucket, clicks, deliveries in rows],
+            ordered=False
+        )
+    
+    async def top_counters(self, kind: str, since: int, limit: int) -> List[dict]:
+        pipeline = [
+            {'$match': {'kind': kind, 'bucket': {'$gte': since}}},
+            {'$group': {'_id': '$name', 'clicks': {'$sum': '$clicks'}, 'deliveries': {'$sum': '$deliveries'}}},
+            {'$sort': {'clicks': -1, 'deliveries': -1}},
+            {'$limit': limit},
+        ]
+        return await self._run(lambda: [
+            {'name': doc['_id'], 'clicks': doc['clicks'], 'deliveries': doc['deliveries']}
+            for doc in self.link_stats.aggregate(pipeline)
+        ])
+    
+    async def counter_totals(self, kind: str, since: int) -> Dict[str, int]:
+        pipeline = [
+            {'$match': {'kind': kind, 'bucket': {'$gte': since}}},
+            {'$group': {'_id': None, 'clicks': {'$sum': '$clicks'}, 'deliveries': {'$sum': '$deliveries'}}},
+        ]
+        docs = await self._run(lambda: list(self.link_stats.aggregate(pipeline)))
+        if not docs:
+            return {'clicks': 0, 'deliveries': 0}
+        return {'clicks': docs[0]['clicks'], 'deliveries': docs[0]['deliveries']}
+    
+    async def delete_counters(self, before: int):
+        await self._run(self.link_stats.delete_many, {'bucket': {'$lt': before}})
+    
+    # pymongo is thread-safe and blocking, so the sync facade can call it directly
     def get_setting(self, key: str, default=None) -> Any:
         setting = self.settings_collection.find_one({'_id': key})
         if setting:
@@ -70,23 +375,40 @@ class MongoDatabase(DatabaseInterface):
             upsert=True
         )
     
+    async def get_setting_async(self, key: str, default=None) -> Any:
+        return await self._run(self.get_setting, key, default)
+    
+    async def update_setting_async(self, key: str, value: Any):
+        await self._run(self.update_setting, key, value)
+    
+    def get_all_settings_sync(self) -> Dict[str, Any]:
+        return {doc['_id']: doc.get('value') for doc in self.settings_collection.find()}
+    
+    async def get_all_settings(self) -> Dict[str, Any]:
+        return await self._run(self.get_all_settings_sync)
+    
     async def close(self):
         self.client.close()
+        self._executor.shutdown(wait=False)
 
 
 # PostgreSQL Implementation (NeonDB, Supabase, etc.)
 class PostgreSQLDatabase(DatabaseInterface):
-    def __init__(self, uri: str, db_name: str = None):
+    def __init__(self, uri: str, db_name: str = None, pool_size: int = DB_POOL_SIZE):
         import asyncpg
         import json
         self.uri = uri
+        self.pool_size = pool_size
         self.pool = None
+        self._init_args = (uri, db_name, 1)
         self.json = json
         self._asyncpg = asyncpg
     
     async def _ensure_pool(self):
         if self.pool is None:
-            self.pool = await self._asyncpg.create_pool(self.uri)
+            self.pool = await self._asyncpg.create_pool(
+                self.uri, min_size=min(2, self.pool_size), max_size=self.pool_size
+            )
             await self._create_tables()
     
     async def _create_tables(self):
@@ -102,6 +424,41 @@ class PostgreSQLDatabase(DatabaseInterface):
                     value JSONB
                 )
             ''')
+            await conn.execute('''
+                CREATE TABLE IF NOT EXISTS files (
+                    msg_id BIGINT PRIMARY KEY,
+                    data JSONB
+                )
+            ''')
+            await conn.execute('''
+                CREATE TABLE IF NOT EXISTS checkpoints (
+                    name TEXT PRIMARY KEY,
+                    data JSONB
+                )
+            ''')
+            await conn.execute('''
+                CREATE TABLE IF NOT EXISTS deletions (
+                    id TEXT PRIMARY KEY,
+                    due_at DOUBLE PRECISION,
+                    data JSONB
+                )
+            ''')
+            await conn.execute('''
+                CREATE TABLE IF NOT EXISTS batches (
+                    token TEXT PRIMARY KEY,
+                    data JSONB
+                )
+            ''')
+            await conn.execute('''
+                CREATE TABLE IF NOT EXISTS link_stats (
+                    kind TEXT,
+                    name TEXT,
+                    bucket BIGINT,
+                    clicks BIGINT DEFAULT 0,
+                    deliveries BIGINT DEFAULT 0,
+                    PRIMARY KEY (kind, name, bucket)
+                )
+            ''')
     
     async def present_user(self, user_id: int) -> bool:
         await self._ensure_pool()
@@ -120,22 +477,192 @@ class PostgreSQLDatabase(DatabaseInterface):
                 user_id
             )
     
+    async def add_users(self, user_ids: List[int]):
+        if not user_ids:
+            return
+        await self._ensure_pool()
+        async with self.pool.acquire() as conn:
+            await conn.execute(
+                'INSERT INTO users (user_id) SELECT unnest($1::bigint[]) ON CONFLICT DO NOTHING',
+                list(user_ids)
+            )
+    
     async def full_userbase(self) -> List[int]:
         await self._ensure_pool()
         async with self.pool.acquire() as conn:
             rows = await conn.fetch('SELECT user_id FROM users')
             return [row['user_id'] for row in rows]
     
+    async def get_user_page(self, after_id: Optional[int], limit: int) -> List[int]:
+        await self._ensure_pool()
+        async with self.pool.acquire() as conn:
+            if after_id is None:
+                rows = await conn.fetch('SELECT user_id FROM users ORDER BY user_id LIMIT $1', limit)
+            else:
+                rows = await conn.fetch(
+                    'SELECT user_id FROM users WHERE user_id > $1 ORDER BY user_id LIMIT $2',
+                    after_id, limit
+                )
+            return [row['user_id'] for row in rows]
+    
+    async def count_users(self) -> int:
+        await self._ensure_pool()
+        async with self.pool.acquire() as conn:
+            return await conn.fetchval('SELECT COUNT(*) FROM users')
+    
     async def del_user(self, user_id: int):
         await self._ensure_pool()
         async with self.pool.acquire() as conn:
             await conn.execute('DELETE FROM users WHERE user_id = $1', user_id)
     
-    def get_setting(self, key: str, default=None) -> Any:
-        import asyncio
-        return asyncio.run(self._get_setting_async(key, default))
+    async def del_users(self, user_ids: List[int]):
+        if not user_ids:
+            return
+        await self._ensure_pool()
+        async with self.pool.acquire() as conn:
+            await conn.execute('DELETE FROM users WHERE user_id = ANY($1::bigint[])', list(user_ids))
+    
+    async def get_file_records(self, message_ids: List[int]) -> Dict[int, dict]:
+        await self._ensure_pool()
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                'SELECT msg_id, data FROM files WHERE msg_id = ANY($1::bigint[])',
+                list(message_ids)
+            )
+            return {row['msg_id']: self.json.loads(row['data']) for row in rows}
+    
+    async def save_file_records(self, records: List[dict]):
+        if not records:
+            return
+        await self._ensure_pool()
+        async with self.pool.acquire() as conn:
+            await conn.executemany(
+                '''INSERT INTO files (msg_id, data) VALUES ($1, $2)
+                   ON CONFLICT (msg_id) DO UPDATE SET data = EXCLUDED.data''',
+                [(r['id'], self.json.dumps(r)) for r in records]
+            )
+    
+    async def delete_file_records(self, message_ids: List[int]):
+        await self._ensure_pool()
+        async with self.pool.acquire() as conn:
+            await conn.execute('DELETE FROM files WHERE msg_id = ANY($1::bigint[])', list(message_ids))
+    
+    async def get_checkpoint(self, name: str) -> Optional[dict]:
+        await self._ensure_pool()
+        async with self.pool.acquire() as conn:
+            result = await conn.fetchval('SELECT data FROM checkpoints WHERE name = $1', name)
+            return self.json.loads(result) if result else None
+    
+    async def save_checkpoint(self, name: str, data: dict):
+        await self._ensure_pool()
+        async with self.pool.acquire() as conn:
+            await conn.execute(
+                '''INSERT INTO checkpoints (name, data) VALUES ($1, $2)
+                   ON CONFLICT (name) DO UPDATE SET data = $2''',
+                name, self.json.dumps(data)
+            )
+    
+    async def delete_checkpoint(self, name: str):
+        await self._ensure_pool()
+        async with self.pool.acquire() as conn:
+            await conn.execute('DELETE FROM checkpoints WHERE name = $1', name)
+    
+    async def list_checkpoints(self, prefix: str) -> Dict[str, dict]:
+        await self._ensure_pool()
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch('SELECT name, data FROM checkpoints WHERE name LIKE $1', prefix + '%')
+            return {row['name']: self.json.loads(row['data']) for row in rows}
+    
+    async def add_deletion(self, job: dict):
+        await self._ensure_pool()
+        async with self.pool.acquire() as conn:
+            await conn.execute(
+                'INSERT INTO deletions (id, due_at, data) VALUES ($1, $2, $3)',
+                job['id'], job['due_at'], self.json.dumps(job)
+            )
+    
+    async def get_deletions(self) -> List[dict]:
+        await self._ensure_pool()
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch('SELECT data FROM deletions')
+            return [self.json.loads(row['data']) for row in rows]
+    
+    async def remove_deletions(self, job_ids: List[str]):
+        if not job_ids:
+            return
+        await self._ensure_pool()
+        async with self.pool.acquire() as conn:
+            await conn.execute('DELETE FROM deletions WHERE id = ANY($1::text[])', list(job_ids))
+    
+    async def save_batch(self, token: str, data: dict):
+        await self._ensure_pool()
+        async with self.pool.acquire() as conn:
+            await conn.execute(
+                '''INSERT INTO batches (token, data) VALUES ($1, $2)
+                   ON CONFLICT (token) DO UPDATE SET data = $2''',
+                token, self.json.dumps(data)
+            )
+    
+    async def get_batch(self, token: str) -> Optional[dict]:
+        await self._ensure_pool()
+        async with self.pool.acquire() as conn:
+            result = await conn.fetchval('SELECT data FROM batches WHERE token = $1', token)
+            return self.json.loads(result) if result else None
+    
+    async def delete_batch(self, token: str):
+        await self._ensure_pool()
+        async with self.pool.acquire() as conn:
+            await conn.execute('DELETE FROM batches WHERE token = $1', token)
     
-    async def _get_setting_async(self, key: str, default=None) -> Any:
+    async def delete_expired_batches(self, now: float):
+        await self._ensure_pool()
+        async with self.pool.acquire() as conn:
+            await conn.execute(
+                "DELETE FROM batches WHERE (data->>'expires_at')::float8 < $1",
+                now
+            )
+    
+    async def add_counters(self, rows: List[Tuple[str, str, int, int, int]]):
+        if not rows:
+            return
+        await self._ensure_pool()
+        async with self.pool.acquire() as conn:
+            await conn.executemany(
+                '''INSERT INTO link_stats (kind, name, bucket, clicks, deliveries) VALUES ($1, $2, $3, $4, $5)
+                   ON CONFLICT (kind, name, bucket) DO UPDATE
+                   SET clicks = link_stats.clicks + EXCLUDED.clicks,
+                       deliveries = link_stats.deliveries + EXCLUDED.deliveries''',
+                rows
+            )
+    
+    async def top_counters(self, kind: str, since: int, limit: int) -> List[dict]:
+        await self._ensure_pool()
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                '''SELECT name, SUM(clicks) AS clicks, SUM(deliveries) AS deliveries FROM link_stats
+                   WHERE kind = $1 AND bucket >= $2 GROUP BY name
+                   ORDER BY clicks DESC, deliveries DESC LIMIT $3''',
+                kind, since, limit
+            )
+            return [{'name': row['name'], 'clicks': int(row['clicks']), 'deliveries': int(row['deliveries'])}
+                    for row in rows]
+    
+    async def counter_totals(self, kind: str, since: int) -> Dict[str, int]:
+        await self._ensure_pool()
+        async with self.pool.acquire() as conn:
+            row = await conn.fetchrow(
+                '''SELECT COALESCE(SUM(clicks), 0) AS clicks, COALESCE(SUM(deliveries), 0) AS deliveries
+                   FROM link_stats WHERE kind = $1 AND bucket >= $2''',
+                kind, since
+            )
+            return {'clicks': int(row['clicks']), 'deliveries': int(row['deliveries'])}
+    
+    async def delete_counters(self, before: int):
+        await self._ensure_pool()
+        async with self.pool.acquire() as conn:
+            await conn.execute('DELETE FROM link_stats WHERE bucket < $1', before)
+    
+    async def get_setting_async(self, key: str, default=None) -> Any:
         await self._ensure_pool()
         async with self.pool.acquire() as conn:
             result = await conn.fetchval(
@@ -144,11 +671,13 @@ class PostgreSQLDatabase(DatabaseInterface):
             )
             return self.json.loads(result) if result else default
     
-    def update_setting(self, key: str, value: Any):
-        import asyncio
-        asyncio.run(self._update_setting_async(key, value))
+    async def get_all_settings(self) -> Dict[str, Any]:
+        await self._ensure_pool()
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch('SELECT key, value FROM settings')
+            return {row['key']: self.json.loads(row['value']) for row in rows if row['value']}
     
-    async def _update_setting_async(self, key: str, value: Any):
+    async def update_setting_async(self, key: str, value: Any):
         await self._ensure_pool()
         async with self.pool.acquire() as conn:
             await conn.execute(
@@ -164,13 +693,14 @@ class PostgreSQLDatabase(DatabaseInterface):
 
 # MySQL Implementation
 class MySQLDatabase(DatabaseInterface):
-    def __init__(self, uri: str, db_name: str = None):
+    def __init__(self, uri: str, db_name: str = None, pool_size: int = DB_POOL_SIZE):
         import aiomysql
         import json
         from urllib.parse import urlparse
         
         self.json = json
         self._aiomysql = aiomysql
+        self._init_args = (uri, db_name, 1)
         
         # Parse the URI
         parsed = urlparse(uri)
@@ -180,6 +710,8 @@ class MySQLDatabase(DatabaseInterface):
             'user': parsed.username,
             'password': parsed.password,
             'db': db_name or parsed.path.lstrip('/'),
+            'minsize': min(2, pool_size),
+            'maxsize': pool_size,
         }
         self.pool = None
     
@@ -202,6 +734,41 @@ class MySQLDatabase(DatabaseInterface):
                         value JSON
                     )
                 ''')
+                await cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS files (
+                        msg_id BIGINT PRIMARY KEY,
+                        data JSON
+                    )
+                ''')
+                await cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS checkpoints (
+                        name VARCHAR(255) PRIMARY KEY,
+                        data JSON
+                    )
+                ''')
+                await cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS deletions (
+                        id VARCHAR(64) PRIMARY KEY,
+                        due_at DOUBLE,
+                        data JSON
+                    )
+                ''')
+                await cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS batches (
+                        token VARCHAR(64) PRIMARY KEY,
+                        data JSON
+                    )
+                ''')
+                await cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS link_stats (
+                        kind VARCHAR(16),
+                        name VARCHAR(128),
+                        bucket BIGINT,
+                        clicks BIGINT DEFAULT 0,
+                        deliveries BIGINT DEFAULT 0,
+                        PRIMARY KEY (kind, name, bucket)
+                    )
+                ''')
                 await conn.commit()
     
     async def present_user(self, user_id: int) -> bool:
@@ -225,6 +792,18 @@ class MySQLDatabase(DatabaseInterface):
                 )
                 await conn.commit()
     
+    async def add_users(self, user_ids: List[int]):
+        if not user_ids:
+            return
+        await self._ensure_pool()
+        async with self.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.executemany(
+                    'INSERT IGNORE INTO users (user_id) VALUES (%s)',
+                    [(uid,) for uid in user_ids]
+                )
+                await conn.commit()
+    
     async def full_userbase(self) -> List[int]:
         await self._ensure_pool()
         async with self.pool.acquire() as conn:
@@ -233,30 +812,246 @@ class MySQLDatabase(DatabaseInterface):
                 rows = await cursor.fetchall()
                 return [row[0] for row in rows]
     
-    async def del_user(self, user_id: int):
+    async def get_user_page(self, after_id: Optional[int], limit: int) -> List[int]:
         await self._ensure_pool()
         async with self.pool.acquire() as conn:
             async with conn.cursor() as cursor:
-                await cursor.execute('DELETE FROM users WHERE user_id = %s', (user_id,))
-                await conn.commit()
-    
-    def get_setting(self, key: str, default=None) -> Any:
-        import asyncio
-        return asyncio.run(self._get_setting_async(key, default))
+                if after_id is None:
+                    await cursor.execute('SELECT user_id FROM users ORDER BY user_id LIMIT %s', (limit,))
+                else:
+                    await cursor.execute(
+                        'SELECT user_id FROM users WHERE user_id > %s ORDER BY user_id LIMIT %s',
+                        (after_id, limit)
+                    )
+                rows = await cursor.fetchall()
+                return [row[0] for row in rows]
     
-    async def _get_setting_async(self, key: str, default=None) -> Any:
+    async def count_users(self) -> int:
         await self._ensure_pool()
         async with self.pool.acquire() as conn:
             async with conn.cursor() as cursor:
-                await cursor.execute('SELECT value FROM settings WHERE `key` = %s', (key,))
-                result = await cursor.fetchone()
-                return self.json.loads(result[0]) if result else default
+                await cursor.execute('SELECT COUNT(*) FROM users')
+                return (await cursor.fetchone())[0]
     
-    def update_setting(self, key: str, value: Any):
-        import asyncio
-        asyncio.run(self._update_setting_async(key, value))
+    async def del_user(self, user_id: int):
+        await self._ensure_pool()
+        async with self.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute('DELETE FROM users WHERE user_id = %s', (user_id,))
+                await conn.commit()
     
-    async def _update_setting_async(self, key: str, value: Any):
+    async def del_users(self, user_ids: List[int]):
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+        await self._ensure_pool()
+        async with self.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                placeholders = ', '.join(['%s'] * len(user_ids))
+                await cursor.execute(f'DELETE FROM users WHERE user_id IN ({placeholders})', user_ids)
+                await conn.commit()
+    
+    async def get_file_records(self, message_ids: List[int]) -> Dict[int, dict]:
+        message_ids = list(message_ids)
+        if not message_ids:
+            return {}
+        await self._ensure_pool()
+        async with self.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                placeholders = ', '.join(['%s'] * len(message_ids))
+                await cursor.execute(
+                    f'SELECT msg_id, data FROM files WHERE msg_id IN ({placeholders})',
+                    message_ids
+                )
+                rows = await cursor.fetchall()
+                return {row[0]: self.json.loads(row[1]) for row in rows}
+    
+    async def save_file_records(self, records: List[dict]):
+        if not records:
+            return
+        await self._ensure_pool()
+        async with self.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.executemany(
+                    '''INSERT INTO files (msg_id, data) VALUES (%s, %s)
+                       ON DUPLICATE KEY UPDATE data = VALUES(data)''',
+                    [(r['id'], self.json.dumps(r)) for r in records]
+                )
+                await conn.commit()
+    
+    async def delete_file_records(self, message_ids: List[int]):
+        message_ids = list(message_ids)
+        if not message_ids:
+            return
+        await self._ensure_pool()
+        async with self.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                placeholders = ', '.join(['%s'] * len(message_ids))
+                await cursor.execute(f'DELETE FROM files WHERE msg_id IN ({placeholders})', message_ids)
+                await conn.commit()
+    
+    async def get_checkpoint(self, name: str) -> Optional[dict]:
+        await self._ensure_pool()
+        async with self.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute('SELECT data FROM checkpoints WHERE name = %s', (name,))
+                result = await cursor.fetchone()
+                return self.json.loads(result[0]) if result else None
+    
+    async def save_checkpoint(self, name: str, data: dict):
+        await self._ensure_pool()
+        async with self.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(
+                    '''INSERT INTO checkpoints (name, data) VALUES (%s, %s)
+                       ON DUPLICATE KEY UPDATE data = VALUES(data)''',
+                    (name, self.json.dumps(data))
+                )
+                await conn.commit()
+    
+    async def delete_checkpoint(self, name: str):
+        await self._ensure_pool()
+        async with self.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute('DELETE FROM checkpoints WHERE name = %s', (name,))
+                await conn.commit()
+    
+    async def list_checkpoints(self, prefix: str) -> Dict[str, dict]:
+        await self._ensure_pool()
+        async with self.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute('SELECT name, data FROM checkpoints WHERE name LIKE %s', (prefix + '%',))
+                rows = await cursor.fetchall()
+                return {row[0]: self.json.loads(row[1]) for row in rows}
+    
+    async def add_deletion(self, job: dict):
+        await self._ensure_pool()
+        async with self.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(
+                    'INSERT INTO deletions (id, due_at, data) VALUES (%s, %s, %s)',
+                    (job['id'], job['due_at'], self.json.dumps(job))
+                )
+                await conn.commit()
+    
+    async def get_deletions(self) -> List[dict]:
+        await self._ensure_pool()
+        async with self.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute('SELECT data FROM deletions')
+                rows = await cursor.fetchall()
+                return [self.json.loads(row[0]) for row in rows]
+    
+    async def remove_deletions(self, job_ids: List[str]):
+        job_ids = list(job_ids)
+        if not job_ids:
+            return
+        await self._ensure_pool()
+        async with self.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                placeholders = ', '.join(['%s'] * len(job_ids))
+                await cursor.execute(f'DELETE FROM deletions WHERE id IN ({placeholders})', job_ids)
+                await conn.commit()
+    
+    async def save_batch(self, token: str, data: dict):
+        await self._ensure_pool()
+        async with self.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(
+                    '''INSERT INTO batches (token, data) VALUES (%s, %s)
+                       ON DUPLICATE KEY UPDATE data = VALUES(data)''',
+                    (token, self.json.dumps(data))
+                )
+                await conn.commit()
+    
+    async def get_batch(self, token: str) -> Optional[dict]:
+        await self._ensure_pool()
+        async with self.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute('SELECT data FROM batches WHERE token = %s', (token,))
+                result = await cursor.fetchone()
+                return self.json.loads(result[0]) if result else None
+    
+    async def delete_batch(self, token: str):
+        await self._ensure_pool()
+        async with self.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute('DELETE FROM batches WHERE token = %s', (token,))
+                await conn.commit()
+    
+    async def delete_expired_batches(self, now: float):
+        await self._ensure_pool()
+        async with self.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(
+                    "DELETE FROM batches WHERE JSON_EXTRACT(data, '$.expires_at') < %s",
+                    (now,)
+                )
+                await conn.commit()
+    
+    async def add_counters(self, rows: List[Tuple[str, str, int, int, int]]):
+        if not rows:
+            return
+        await self._ensure_pool()
+        async with self.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.executemany(
+                    '''INSERT INTO link_stats (kind, name, bucket, clicks, deliveries) VALUES (%s, %s, %s, %s, %s)
+                       ON DUPLICATE KEY UPDATE clicks = clicks + VALUES(clicks),
+                                               deliveries = deliveries + VALUES(deliveries)''',
+                    rows
+                )
+                await conn.commit()
+    
+    async def top_counters(self, kind: str, since: int, limit: int) -> List[dict]:
+        await self._ensure_pool()
+        async with self.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(
+                    '''SELECT name, SUM(clicks) AS total_clicks, SUM(deliveries) AS total_deliveries FROM link_stats
+                       WHERE kind = %s AND bucket >= %s GROUP BY name
+                       ORDER BY total_clicks DESC, total_deliveries DESC LIMIT %s''',
+                    (kind, since, limit)
+                )
+                rows = await cursor.fetchall()
+                return [{'name': row[0], 'clicks': int(row[1]), 'deliveries': int(row[2])} for row in rows]
+    
+    async def counter_totals(self, kind: str, since: int) -> Dict[str, int]:
+        await self._ensure_pool()
+        async with self.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(
+                    '''SELECT COALESCE(SUM(clicks), 0), COALESCE(SUM(deliveries), 0)
+                       FROM link_stats WHERE kind = %s AND bucket >= %s''',
+                    (kind, since)
+                )
+                row = await cursor.fetchone()
+                return {'clicks': int(row[0]), 'deliveries': int(row[1])}
+    
+    async def delete_counters(self, before: int):
+        await self._ensure_pool()
+        async with self.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute('DELETE FROM link_stats WHERE bucket < %s', (before,))
+                await conn.commit()
+    
+    async def get_setting_async(self, key: str, default=None) -> Any:
+        await self._ensure_pool()
+        async with self.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute('SELECT value FROM settings WHERE `key` = %s', (key,))
+                result = await cursor.fetchone()
+                return self.json.loads(result[0]) if result else default
+    
+    async def get_all_settings(self) -> Dict[str, Any]:
+        await self._ensure_pool()
+        async with self.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute('SELECT `key`, value FROM settings')
+                rows = await cursor.fetchall()
+                return {row[0]: self.json.loads(row[1]) for row in rows if row[1]}
+    
+    async def update_setting_async(self, key: str, value: Any):
         await self._ensure_pool()
         async with self.pool.acquire() as conn:
             async with conn.cursor() as cursor:
@@ -279,6 +1074,7 @@ class SQLiteDatabase(DatabaseInterface):
         import aiosqlite
         import json
         self.db_path = db_name or 'bot_data.db'
+        self._init_args = (uri, db_name)
         self.json = json
         self._aiosqlite = aiosqlite
         self.connection = None
@@ -300,6 +1096,41 @@ class SQLiteDatabase(DatabaseInterface):
                 value TEXT
             )
         ''')
+        await self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS files (
+                msg_id INTEGER PRIMARY KEY,
+                data TEXT
+            )
+        ''')
+        await self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                name TEXT PRIMARY KEY,
+                data TEXT
+            )
+        ''')
+        await self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS deletions (
+                id TEXT PRIMARY KEY,
+                due_at REAL,
+                data TEXT
+            )
+        ''')
+        await self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS batches (
+                token TEXT PRIMARY KEY,
+                data TEXT
+            )
+        ''')
+        await self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS link_stats (
+                kind TEXT,
+                name TEXT,
+                bucket INTEGER,
+                clicks INTEGER DEFAULT 0,
+                deliveries INTEGER DEFAULT 0,
+                PRIMARY KEY (kind, name, bucket)
+            )
+        ''')
         await self.connection.commit()
     
     async def present_user(self, user_id: int) -> bool:
@@ -319,22 +1150,201 @@ class SQLiteDatabase(DatabaseInterface):
         )
         await self.connection.commit()
     
+    async def add_users(self, user_ids: List[int]):
+        if not user_ids:
+            return
+        await self._ensure_connection()
+        await self.connection.executemany(
+            'INSERT OR IGNORE INTO users (user_id) VALUES (?)',
+            [(uid,) for uid in user_ids]
+        )
+        await self.connection.commit()
+    
     async def full_userbase(self) -> List[int]:
         await self._ensure_connection()
         cursor = await self.connection.execute('SELECT user_id FROM users')
         rows = await cursor.fetchall()
         return [row[0] for row in rows]
     
+    async def get_user_page(self, after_id: Optional[int], limit: int) -> List[int]:
+        await self._ensure_connection()
+        if after_id is None:
+            cursor = await self.connection.execute(
+                'SELECT user_id FROM users ORDER BY user_id LIMIT ?', (limit,)
+            )
+        else:
+            cursor = await self.connection.execute(
+                'SELECT user_id FROM users WHERE user_id > ? ORDER BY user_id LIMIT ?',
+                (after_id, limit)
+            )
+        rows = await cursor.fetchall()
+        return [row[0] for row in rows]
+    
+    async def count_users(self) -> int:
+        await self._ensure_connection()
+        cursor = await self.connection.execute('SELECT COUNT(*) FROM users')
+        return (await cursor.fetchone())[0]
+    
     async def del_user(self, user_id: int):
         await self._ensure_connection()
         await self.connection.execute('DELETE FROM users WHERE user_id = ?', (user_id,))
         await self.connection.commit()
     
-    def get_setting(self, key: str, default=None) -> Any:
-        import asyncio
-        return asyncio.run(self._get_setting_async(key, default))
+    async def del_users(self, user_ids: List[int]):
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+        await self._ensure_connection()
+        placeholders = ', '.join(['?'] * len(user_ids))
+        await self.connection.execute(f'DELETE FROM users WHERE user_id IN ({placeholders})', user_ids)
+        await self.connection.commit()
     
-    async def _get_setting_async(self, key: str, default=None) -> Any:
+    async def get_file_records(self, message_ids: List[int]) -> Dict[int, dict]:
+        message_ids = list(message_ids)
+        if not message_ids:
+            return {}
+        await self._ensure_connection()
+        placeholders = ', '.join(['?'] * len(message_ids))
+        cursor = await self.connection.execute(
+            f'SELECT msg_id, data FROM files WHERE msg_id IN ({placeholders})',
+            message_ids
+        )
+        rows = await cursor.fetchall()
+        return {row[0]: self.json.loads(row[1]) for row in rows}
+    
+    async def save_file_records(self, records: List[dict]):
+        if not records:
+            return
+        await self._ensure_connection()
+        await self.connection.executemany(
+            'INSERT OR REPLACE INTO files (msg_id, data) VALUES (?, ?)',
+            [(r['id'], self.json.dumps(r)) for r in records]
+        )
+        await self.connection.commit()
+    
+    async def delete_file_records(self, message_ids: List[int]):
+        message_ids = list(message_ids)
+        if not message_ids:
+            return
+        await self._ensure_connection()
+        placeholders = ', '.join(['?'] * len(message_ids))
+        await self.connection.execute(f'DELETE FROM files WHERE msg_id IN ({placeholders})', message_ids)
+        await self.connection.commit()
+    
+    async def get_checkpoint(self, name: str) -> Optional[dict]:
+        await self._ensure_connection()
+        cursor = await self.connection.execute('SELECT data FROM checkpoints WHERE name = ?', (name,))
+        result = await cursor.fetchone()
+        return self.json.loads(result[0]) if result else None
+    
+    async def save_checkpoint(self, name: str, data: dict):
+        await self._ensure_connection()
+        await self.connection.execute(
+            'INSERT OR REPLACE INTO checkpoints (name, data) VALUES (?, ?)',
+            (name, self.json.dumps(data))
+        )
+        await self.connection.commit()
+    
+    async def delete_checkpoint(self, name: str):
+        await self._ensure_connection()
+        await self.connection.execute('DELETE FROM checkpoints WHERE name = ?', (name,))
+        await self.connection.commit()
+    
+    async def list_checkpoints(self, prefix: str) -> Dict[str, dict]:
+        await self._ensure_connection()
+        cursor = await self.connection.execute('SELECT name, data FROM checkpoints WHERE name LIKE ?', (prefix + '%',))
+        rows = await cursor.fetchall()
+        return {row[0]: self.json.loads(row[1]) for row in rows}
+    
+    async def add_deletion(self, job: dict):
+        await self._ensure_connection()
+        await self.connection.execute(
+            'INSERT INTO deletions (id, due_at, data) VALUES (?, ?, ?)',
+            (job['id'], job['due_at'], self.json.dumps(job))
+        )
+        await self.connection.commit()
+    
+    async def get_deletions(self) -> List[dict]:
+        await self._ensure_connection()
+        cursor = await self.connection.execute('SELECT data FROM deletions')
+        rows = await cursor.fetchall()
+        return [self.json.loads(row[0]) for row in rows]
+    
+    async def remove_deletions(self, job_ids: List[str]):
+        job_ids = list(job_ids)
+        if not job_ids:
+            return
+        await self._ensure_connection()
+        placeholders = ', '.join(['?'] * len(job_ids))
+        await self.connection.execute(f'DELETE FROM deletions WHERE id IN ({placeholders})', job_ids)
+        await self.connection.commit()
+    
+    async def save_batch(self, token: str, data: dict):
+        await self._ensure_connection()
+        await self.connection.execute(
+            'INSERT OR REPLACE INTO batches (token, data) VALUES (?, ?)',
+            (token, self.json.dumps(data))
+        )
+        await self.connection.commit()
+    
+    async def get_batch(self, token: str) -> Optional[dict]:
+        await self._ensure_connection()
+        cursor = await self.connection.execute('SELECT data FROM batches WHERE token = ?', (token,))
+        result = await cursor.fetchone()
+        return self.json.loads(result[0]) if result else None
+    
+    async def delete_batch(self, token: str):
+        await self._ensure_connection()
+        await self.connection.execute('DELETE FROM batches WHERE token = ?', (token,))
+        await self.connection.commit()
+    
+    async def delete_expired_batches(self, now: float):
+        await self._ensure_connection()
+        await self.connection.execute(
+            "DELETE FROM batches WHERE json_extract(data, '$.expires_at') < ?",
+            (now,)
+        )
+        await self.connection.commit()
+    
+    async def add_counters(self, rows: List[Tuple[str, str, int, int, int]]):
+        if not rows:
+            return
+        await self._ensure_connection()
+        await self.connection.executemany(
+            '''INSERT INTO link_stats (kind, name, bucket, clicks, deliveries) VALUES (?, ?, ?, ?, ?)
+               ON CONFLICT (kind, name, bucket) DO UPDATE
+               SET clicks = clicks + excluded.clicks, deliveries = deliveries + excluded.deliveries''',
+            rows
+        )
+        await self.connection.commit()
+    
+    async def top_counters(self, kind: str, since: int, limit: int) -> List[dict]:
+        await self._ensure_connection()
+        cursor = await self.connection.execute(
+            '''SELECT name, SUM(clicks) AS total_clicks, SUM(deliveries) AS total_deliveries FROM link_stats
+               WHERE kind = ? AND bucket >= ? GROUP BY name
+               ORDER BY total_clicks DESC, total_deliveries DESC LIMIT ?''',
+            (kind, since, limit)
+        )
+        rows = await cursor.fetchall()
+        return [{'name': row[0], 'clicks': row[1], 'deliveries': row[2]} for row in rows]
+    
+    async def counter_totals(self, kind: str, since: int) -> Dict[str, int]:
+        await self._ensure_connection()
+        cursor = await self.connection.execute(
+            '''SELECT COALESCE(SUM(clicks), 0), COALESCE(SUM(deliveries), 0)
+               FROM link_stats WHERE kind = ? AND bucket >= ?''',
+            (kind, since)
+        )
+        row = await cursor.fetchone()
+        return {'clicks': row[0], 'deliveries': row[1]}
+    
+    async def delete_counters(self, before: int):
+        await self._ensure_connection()
+        await self.connection.execute('DELETE FROM link_stats WHERE bucket < ?', (before,))
+        await self.connection.commit()
+    
+    async def get_setting_async(self, key: str, default=None) -> Any:
         await self._ensure_connection()
         cursor = await self.connection.execute(
             'SELECT value FROM settings WHERE key = ?',
@@ -343,11 +1353,13 @@ class SQLiteDatabase(DatabaseInterface):
         result = await cursor.fetchone()
         return self.json.loads(result[0]) if result else default
     
-    def update_setting(self, key: str, value: Any):
-        import asyncio
-        asyncio.run(self._update_setting_async(key, value))
+    async def get_all_settings(self) -> Dict[str, Any]:
+        await self._ensure_connection()
+        cursor = await self.connection.execute('SELECT key, value FROM settings')
+        rows = await cursor.fetchall()
+        return {row[0]: self.json.loads(row[1]) for row in rows if row[1]}
     
-    async def _update_setting_async(self, key: str, value: Any):
+    async def update_setting_async(self, key: str, value: Any):
         await self._ensure_connection()
         await self.connection.execute(
             'INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)',
@@ -361,43 +1373,513 @@ class SQLiteDatabase(DatabaseInterface):
 
 
 # Factory function to create the appropriate database instance
-def create_database(db_type: str = None, uri: str = None, db_name: str = None) -> DatabaseInterface:
+def create_database(db_type: str = None, uri: str = None, db_name: str = None,
+                    pool_size: int = None) -> DatabaseInterface:
     db_type = db_type or DB_TYPE or 'mongodb'
     uri = uri or DB_URI
     db_name = db_name or DB_NAME
+    pool_size = pool_size or DB_POOL_SIZE
     
     db_type = db_type.lower()
     
     if db_type in ['mongodb', 'mongo']:
-        return MongoDatabase(uri, db_name)
+        return MongoDatabase(uri, db_name, pool_size)
     elif db_type in ['postgresql', 'postgres', 'neondb', 'neon', 'supabase']:
-        return PostgreSQLDatabase(uri, db_name)
+        return PostgreSQLDatabase(uri, db_name, pool_size)
     elif db_type in ['mysql', 'mariadb']:
-        return MySQLDatabase(uri, db_name)
+        return MySQLDatabase(uri, db_name, pool_size)
     elif db_type in ['sqlite', 'sqlite3']:
         return SQLiteDatabase(uri, db_name)
     else:
         raise ValueError(f"Unsupported database type: {db_type}")
 
 
+class SettingsStore:
+    """
+    In-memory snapshot of the settings table. All keys are loaded with one
+    query and reads never touch the database. Writes go through to the
+    database and bump a version key; other bot processes poll that key and
+    reload the snapshot when it changes.
+    """
+    VERSION_KEY = '_settings_version'
+    
+    def __init__(self, db: DatabaseInterface):
+        self.db = db
+        self.version = None
+        self._values = None
+        self._listeners = []
+        self._watcher = None
+    
+    def _apply(self, values: Dict[str, Any]):
+        self.version = values.pop(self.VERSION_KEY, None)
+        self._values = values
+    
+    def _notify(self, key: Optional[str]):
+        for callback in self._listeners:
+            try:
+                callback(key)
+            except Exception as e:
+                print(f"Settings listener failed: {e}")
+    
+    def subscribe(self, callback):
+        """callback(key) runs after a local write (key) or a remote reload (None)"""
+        self._listeners.append(callback)
+    
+    def load(self):
+        try:
+            self._apply(self.db.get_all_settings_sync())
+        except Exception as e:
+            print(f"⚠️ Could not load settings: {e}")
+            self._values = {}
+    
+    async def reload(self):
+        self._apply(await self.db.get_all_settings())
+        self._notify(None)
+    
+    def get(self, key: str, default=None) -> Any:
+        if self._values is None:
+            self.load()
+        return self._values.get(key, default)
+    
+    def all(self) -> Dict[str, Any]:
+        if self._values is None:
+            self.load()
+        return dict(self._values)
+    
+    def _set_local(self, key: str, value: Any, version: float):
+        if self._values is None:
+            self._values = {}
+        self._values[key] = value
+        self.version = version
+        self._notify(key)
+    
+    async def update(self, key: str, value: Any):
+        version = time.time()
+        await self.db.update_setting_async(key, value)
+        await self.db.update_setting_async(self.VERSION_KEY, version)
+        self._set_local(key, value, version)
+    
+    def update_sync(self, key: str, value: Any):
+        version = time.time()
+        self.db.update_setting(key, value)
+        self.db.update_setting(self.VERSION_KEY, version)
+        self._set_local(key, value, version)
+    
+    async def _watch(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                version = await self.db.get_setting_async(self.VERSION_KEY)
+                if version != self.version:
+                    await self.reload()
+                    print("🔄 Settings changed by another process, snapshot reloaded")
+            except Exception as e:
+                print(f"Settings poll failed: {e}")
+    
+    def start_watching(self, interval: float):
+        if self._watcher is None or self._watcher.done():
+            self._watcher = asyncio.create_task(self._watch(interval))
+
+
+class UserSet:
+    """
+    Compact set of user ids: a sorted array('q') at 8 bytes per id, fronted
+    by a bloom filter that answers "definitely new" without a bisect. Recent
+    changes sit in small overflow sets and are merged into the array in
+    batches so a single add never shifts the whole array.
+    """
+    HASHES = 4
+    BITS_PER_ID = 10
+    MERGE_SIZE = 4096
+    
+    def __init__(self):
+        self.ids = array('q')
+        self.added = set()
+        self.removed = set()
+        self.loaded = False
+        self._size_bloom(0)
+    
+    def _size_bloom(self, count: int):
+        # Room for the set to double before the filter is rebuilt
+        self.capacity = max(1024, count * 2)
+        self.bloom_bits = self.capacity * self.BITS_PER_ID
+        self.bloom = bytearray(self.bloom_bits // 8 + 1)
+    
+    def _bits(self, user_id: int):
+        h1 = (user_id * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+        h2 = ((user_id ^ (user_id >> 29)) * 0xBF58476D1CE4E5B9 & 0xFFFFFFFFFFFFFFFF) | 1
+        for i in range(self.HASHES):
+            yield (h1 + i * h2) % self.bloom_bits
+    
+    def _bloom_add(self, user_id: int):
+        for bit in self._bits(user_id):
+            self.bloom[bit >> 3] |= 1 << (bit & 7)
+    
+    def _in_array(self, user_id: int) -> bool:
+        i = bisect_left(self.ids, user_id)
+        return i < len(self.ids) and self.ids[i] == user_id
+    
+    def _rebuild(self, ids: array):
+        self.ids = ids
+        self.added = set()
+        self.removed = set()
+        self._size_bloom(len(ids))
+        for user_id in ids:
+            self._bloom_add(user_id)
+    
+    @staticmethod
+    def _merge(ids: Iterable[int], extra: Iterable[int], removed: set) -> array:
+        """Merge two ascending id streams, dropping duplicates and removed ids"""
+        merged = array('q')
+        last = None
+        for user_id in heapq.merge(ids, extra):
+            if user_id != last and user_id not in removed:
+                merged.append(user_id)
+            last = user_id
+        return merged
+    
+    def build(self, user_ids: Iterable[int]):
+        """
+        Replace the contents with `user_ids` (ascending, as iter_userbase
+        yields them), keeping changes made while they were loading
+        """
+        extra = set(self.added)
+        if not self.loaded:
+            extra.update(self.ids)
+        self._rebuild(self._merge(user_ids, sorted(extra), self.removed))
+        self.loaded = True
+    
+    def __contains__(self, user_id: int) -> bool:
+        for bit in self._bits(user_id):
+            if not self.bloom[bit >> 3] & (1 << (bit & 7)):
+                return False
+        if user_id in self.added:
+            return True
+        if user_id in self.removed:
+            return False
+        return self._in_array(user_id)
+    
+    def __len__(self) -> int:
+        return len(self.ids) + len(self.added) - len(self.removed)
+    
+    def add(self, user_id: int):
+        # A removal made while loading may not be in the array, so fall through and check
+        self.removed.discard(user_id)
+        if user_id in self:
+            return
+        self.added.add(user_id)
+        self._bloom_add(user_id)
+        if len(self.added) >= self.MERGE_SIZE:
+            self.compact()
+    
+    def discard(self, user_id: int):
+        if user_id in self.added:
+            self.added.discard(user_id)
+        if not self.loaded:
+            # Still loading, the id may be in the rows being read
+            self.removed.add(user_id)
+        elif self._in_array(user_id):
+            self.removed.add(user_id)
+            if len(self.removed) >= self.MERGE_SIZE:
+                self.compact()
+    
+    def compact(self):
+        """Merge the overflow sets into the sorted array"""
+        ids = self._merge(self.ids, sorted(self.added), self.removed)
+        if len(ids) > self.capacity:
+            self._rebuild(ids)
+        else:
+            # Bits of removed ids stay set, the array lookup rejects them
+            self.ids = ids
+            self.added = set()
+            self.removed = set()
+    
+    def memory_usage(self) -> int:
+        """Approximate bytes held by the array, the filter and the overflow sets"""
+        return (
+            self.ids.buffer_info()[1] * self.ids.itemsize
+            + len(self.bloom)
+            + sys.getsizeof(self.added)
+            + sys.getsizeof(self.removed)
+        )
+    
+    def __str__(self):
+        if not self.loaded:
+            return "loading..."
+        return f"{len(self)} ids, {self.memory_usage() / 1048576:.2f} MB"
+
+
+class UserRegistry:
+    """
+    Write-behind buffer for /start registrations. Ids already seen by this
+    process are answered from memory, new ones are queued and written with
+    one bulk insert every `interval` seconds or once `flush_size` are
+    pending, so the handler never waits on the database.
+    
+    With USER_MEMBERSHIP_CACHE the seen ids live in a UserSet preloaded
+    with the whole userbase, which also lets present_user skip the query.
+    """
+    def __init__(self, db: DatabaseInterface, interval: float = USER_FLUSH_INTERVAL,
+                 flush_size: int = USER_FLUSH_SIZE):
+        self.db = db
+        self.interval = interval
+        self.flush_size = flush_size
+        self.seen = UserSet() if USER_MEMBERSHIP_CACHE else set()
+        self.pending = set()
+        self.flushed = 0
+        self._lock = None
+        self._timer = None
+        self._flushing = None
+    
+    def register(self, user_id: int) -> bool:
+        """Queue a user for insertion, returns False if already seen"""
+        if user_id in self.seen:
+            return False
+        self.seen.add(user_id)
+        self.pending.add(user_id)
+        if len(self.pending) >= self.flush_size and (self._flushing is None or self._flushing.done()):
+            self._flushing = asyncio.create_task(self.flush())
+        return True
+    
+    def forget(self, user_id: int):
+        self.seen.discard(user_id)
+        self.pending.discard(user_id)
+    
+    async def flush(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if not self.pending:
+                return
+            batch, self.pending = self.pending, set()
+            try:
+                await self.db.add_users(list(batch))
+                self.flushed += len(batch)
+            except Exception as e:
+                # Keep the ids queued for the next flush
+                self.pending |= batch
+                print(f"User flush failed ({len(batch)} pending): {e}")
+    
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+    
+    @property
+    def members(self) -> Optional[UserSet]:
+        """The full membership set once it is loaded, else None"""
+        if isinstance(self.seen, UserSet) and self.seen.loaded:
+            return self.seen
+        return None
+    
+    async def load(self):
+        started = time.monotonic()
+        try:
+            ids = array('q')
+            async for user_id in self.db.iter_userbase(10000):
+                ids.append(user_id)
+            self.seen.build(ids)
+        except Exception as e:
+            print(f"⚠️ Could not load user ids: {e}")
+            return
+        print(f"👥 User set loaded: {self.seen} ({time.monotonic() - started:.1f}s)")
+    
+    def start(self):
+        if self._timer is None or self._timer.done():
+            self._timer = asyncio.create_task(self._run())
+        if isinstance(self.seen, UserSet) and not self.seen.loaded:
+            asyncio.create_task(self.load())
+    
+    async def stop(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        await self.flush()
+
+
+class LinkStats:
+    """
+    Write-behind click and delivery counters in hourly buckets. Handlers
+    only bump in-memory counts; every `interval` seconds they are added
+    onto the stored counters with one batched upsert. Buckets older than
+    RETENTION are dropped once an hour.
+    """
+    BUCKET = 3600
+    RETENTION = 30 * 86400
+    
+    def __init__(self, db: DatabaseInterface, interval: float = STATS_FLUSH_INTERVAL):
+        self.db = db
+        self.interval = interval
+        self.pending = {}
+        self.flushed = 0
+        self._lock = None
+        self._timer = None
+        self._pruned_bucket = None
+    
+    def _bump(self, kind: str, name: str, clicks: int, deliveries: int):
+        bucket = int(time.time()) // self.BUCKET * self.BUCKET
+        counts = self.pending.setdefault((kind, name, bucket), [0, 0])
+        counts[0] += clicks
+        counts[1] += deliveries
+    
+    def click(self, link: str):
+        """`link` is the canonical parameter, so old and new links to the same files count once"""
+        self._bump('link', link, 1, 0)
+    
+    def delivered(self, link: str, count: int):
+        self._bump('link', link, 0, count)
+    
+    def message_delivered(self, message_id: int):
+        self._bump('message', str(message_id), 0, 1)
+    
+    async def flush(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self.pending:
+                await self._write_pending()
+            await self._prune()
+    
+    async def _write_pending(self):
+        batch, self.pending = self.pending, {}
+        rows = [(kind, name, bucket, clicks, deliveries)
+                for (kind, name, bucket), (clicks, deliveries) in batch.items()]
+        try:
+            await self.db.add_counters(rows)
+            self.flushed += len(rows)
+        except Exception as e:
+            # Merge the counts back so the next flush retries them
+            for key, (clicks, deliveries) in batch.items():
+                counts = self.pending.setdefault(key, [0, 0])
+                counts[0] += clicks
+                counts[1] += deliveries
+            print(f"Link stats flush failed ({len(rows)} rows pending): {e}")
+    
+    async def _prune(self):
+        bucket = int(time.time()) // self.BUCKET * self.BUCKET
+        if bucket == self._pruned_bucket:
+            return
+        try:
+            await self.db.delete_counters(bucket - self.RETENTION)
+            self._pruned_bucket = bucket
+        except Exception as e:
+            print(f"Link stats pruning failed: {e}")
+    
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+    
+    def start(self):
+        if self._timer is None or self._timer.done():
+            self._timer = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        await self.flush()
+
+
 # Initialize the database instance
 database = create_database()
+settings = SettingsStore(database)
+users = UserRegistry(database)
+link_stats = LinkStats(database)
 
 # Wrapper functions for backward compatibility
 async def present_user(user_id: int) -> bool:
+    if users.members is not None:
+        return user_id in users.members
     return await database.present_user(user_id)
 
 async def add_user(user_id: int):
-    return await database.add_user(user_id)
+    await database.add_user(user_id)
+    users.seen.add(user_id)
+
+async def add_users(user_ids: List[int]):
+    await database.add_users(user_ids)
+    for user_id in user_ids:
+        users.seen.add(user_id)
+
+def register_user(user_id: int) -> bool:
+    return users.register(user_id)
 
 async def full_userbase() -> List[int]:
     return await database.full_userbase()
 
+def iter_userbase(batch_size: int = 1000, after_id: Optional[int] = None):
+    return database.iter_userbase(batch_size, after_id)
+
+async def count_users() -> int:
+    return await database.count_users()
+
 async def del_user(user_id: int):
+    users.forget(user_id)
     return await database.del_user(user_id)
 
+async def del_users(user_ids: List[int]):
+    for user_id in user_ids:
+        users.forget(user_id)
+    return await database.del_users(user_ids)
+
+async def get_file_records(message_ids: List[int]) -> Dict[int, dict]:
+    return await database.get_file_records(message_ids)
+
+async def save_file_records(records: List[dict]):
+    return await database.save_file_records(records)
+
+async def delete_file_records(message_ids: List[int]):
+    return await database.delete_file_records(message_ids)
+
+async def get_checkpoint(name: str) -> Optional[dict]:
+    return await database.get_checkpoint(name)
+
+async def save_checkpoint(name: str, data: dict):
+    return await database.save_checkpoint(name, data)
+
+async def delete_checkpoint(name: str):
+    return await database.delete_checkpoint(name)
+
+async def list_checkpoints(prefix: str) -> Dict[str, dict]:
+    return await database.list_checkpoints(prefix)
+
+async def add_deletion(job: dict):
+    return await database.add_deletion(job)
+
+async def get_deletions() -> List[dict]:
+    return await database.get_deletions()
+
+async def remove_deletions(job_ids: List[str]):
+    return await database.remove_deletions(job_ids)
+
+async def save_batch(token: str, data: dict):
+    return await database.save_batch(token, data)
+
+async def get_batch(token: str) -> Optional[dict]:
+    return await database.get_batch(token)
+
+async def delete_batch(token: str):
+    return await database.delete_batch(token)
+
+async def delete_expired_batches(now: float):
+    return await database.delete_expired_batches(now)
+
+async def top_counters(kind: str, since: int, limit: int) -> List[dict]:
+    return await database.top_counters(kind, since, limit)
+
+async def counter_totals(kind: str, since: int) -> Dict[str, int]:
+    return await database.counter_totals(kind, since)
+
+# Settings reads are served from the in-memory snapshot
 def get_setting(key: str, default=None) -> Any:
-    return database.get_setting(key, default)
+    return settings.get(key, default)
 
 def update_setting(key: str, value: Any):
-    return database.update_setting(key, value)
\ No newline at end of file
+    return settings.update_sync(key, value)
+
+async def get_setting_async(key: str, default=None) -> Any:
+    return settings.get(key, default)
+
+async def update_setting_async(key: str, value: Any):
+    return await settings.update(key, value)
\ No newline at end of file
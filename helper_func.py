@@ -1,114 +1,544 @@
-import base64
-
 import re
 
 import asyncio
 
 import logging 
 
-from pyrogram import filters
-
-from pyrogram.enums import ChatMemberStatus
-
-from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-
-from config import FORCE_SUB_CHANNEL, ADMINS, AUTO_DELETE_TIME, AUTO_DEL_SUCCESS_MSG
-
-from pyrogram.errors.exceptions.bad_request_400 import UserNotParticipant
-
-from pyrogram.errors import FloodWait
-
-async def is_subscribed(filter, client, update):
+import time
 
-    if not FORCE_SUB_CHANNEL:
+import heapq
 
-        return True
+import secrets
 
-    user_id = update.from_user.id
+from collections import OrderedDict, defaultdict, deque
 
-    if user_id in ADMINS:
+from datetime import datetime
 
-        return True
+from pyrogram import filters
 
-    try:
+from pyrogram.enums import ChatMemberStatus, ParseMode
 
-        member = await client.get_chat_member(chat_id = FORCE_SUB_CHANNEL, user_id = user_id)
+from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
-    except UserNotParticipant:
+from config import (runtime, ADMINS,
+                    DELIVERY_CONCURRENCY, DELIVERY_LANE_CONCURRENCY, DELIVERY_CHAT_RATE,
+                    DELIVERY_CHAT_BURST, DELIVERY_GLOBAL_RATE, DELIVERY_GLOBAL_BURST,
+                    DELIVERY_MAX_RETRIES, FETCH_CONCURRENCY, FETCH_RETRIES,
+                    MESSAGE_CACHE_SIZE, MESSAGE_CACHE_TTL, FORCE_SUB_CACHE_TTL,
+                    FORCE_SUB_NEGATIVE_TTL, FORCE_SUB_CACHE_SIZE, INVITE_LINK_POOL_SIZE,
+                    INVITE_LINK_TTL, BATCH_CACHE_SIZE)
 
-        return False
+from pyrogram.errors.exceptions.bad_request_400 import UserNotParticipant
 
-    if not member.status in [ChatMemberStatus.OWNER, ChatMemberStatus.ADMINISTRATOR, ChatMemberStatus.MEMBER]:
+from pyrogram.errors import FloodWait, FileReferenceExpired, FileReferenceInvalid, FileIdInvalid, MediaEmpty
 
-        return False
+from link_codec import (encode_link, encode_ids, encode_batch_token, decode_link, canonical_parameter,
+                        LinkError, MAX_PARAMETER_LENGTH, MAX_SET_SIZE)
 
-    else:
+from database.database import (get_file_records, save_file_records, delete_file_records, add_deletion, get_deletions,
+                               remove_deletions, save_batch, get_batch, delete_batch, delete_expired_batches)
 
-        return True
+# ===========================
+# FORCE SUBSCRIBE
+# ===========================
 
-async def encode(string):
+# Statuses that count as joined; RESTRICTED only while the user is still in the chat
+MEMBER_STATUSES = [ChatMemberStatus.OWNER, ChatMemberStatus.ADMINISTRATOR, ChatMemberStatus.MEMBER,
+                   ChatMemberStatus.RESTRICTED]
 
-    string_bytes = string.encode("ascii")
 
-    base64_bytes = base64.urlsafe_b64encode(string_bytes)
+class MembershipCache:
+    """
+    (channel_id, user_id) -> joined, with a long TTL for members and a
+    short one for non-members so a user who just joined is not kept out
+    for long. Member updates overwrite entries as they arrive.
+    """
 
-    base64_string = (base64_bytes.decode("ascii")).strip("=")
+    def __init__(self, ttl: int = FORCE_SUB_CACHE_TTL, negative_ttl: int = FORCE_SUB_NEGATIVE_TTL,
+                 max_size: int = FORCE_SUB_CACHE_SIZE):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
 
-    return base64_string
+    def __len__(self):
+        return len(self._data)
 
-async def decode(base64_string):
+    def get(self, channel_id: int, user_id: int):
+        """True/False if cached, None if unknown or expired"""
+        key = (channel_id, user_id)
+        entry = self._data.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
 
-    base64_string = base64_string.strip("=")
+    def put(self, channel_id: int, user_id: int, joined: bool):
+        if self.max_size <= 0:
+            return
+        key = (channel_id, user_id)
+        self._data[key] = (time.monotonic() + (self.ttl if joined else self.negative_ttl), joined)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
 
-    base64_bytes = (base64_string + "=" * (-len(base64_string) % 4)).encode("ascii")
+    def invalidate(self, channel_id: int, user_id: int):
+        self._data.pop((channel_id, user_id), None)
 
-    string_bytes = base64.urlsafe_b64decode(base64_bytes) 
+    def clear(self):
+        self._data.clear()
 
-    string = string_bytes.decode("ascii")
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
 
-    return string
+    def __str__(self):
+        return f"{len(self)} cached, {self.hits} hits, {self.misses} misses ({self.hit_rate:.0%} hit rate)"
 
-async def get_messages(client, message_ids):
 
-    messages = []
+membership_cache = MembershipCache()
 
-    total_messages = 0
 
-    while total_messages != len(message_ids):
+async def is_member(client, channel_id: int, user_id: int) -> bool:
+    """Membership of one channel, answered from the cache when possible"""
+    joined = membership_cache.get(channel_id, user_id)
+    if joined is not None:
+        return joined
 
-        temb_ids = message_ids[total_messages:total_messages+200]
+    try:
+        member = await client.get_chat_member(chat_id=channel_id, user_id=user_id)
+        joined = member.status in MEMBER_STATUSES
+        if member.status == ChatMemberStatus.RESTRICTED:
+            joined = bool(member.is_member)
+    except UserNotParticipant:
+        joined = False
+    except Exception as e:
+        # Not cached: a misconfigured channel should not lock users out for the TTL
+        print(f"Force sub check failed for {user_id} in {channel_id}: {e}")
+        return False
 
+    membership_cache.put(channel_id, user_id, joined)
+    return joined
+
+
+async def missing_channels(client, user_id: int) -> list:
+    """Force-sub channels `user_id` has not joined, all checked concurrently"""
+    channels = runtime.force_sub_channels
+    if not channels or user_id in ADMINS:
+        return []
+    joined = await asyncio.gather(*(is_member(client, c, user_id) for c in channels))
+    return [c for c, ok in zip(channels, joined) if not ok]
+
+
+async def check_subscription(client, user_id: int) -> bool:
+    """Whether `user_id` may use the bot, i.e. has joined every force-sub channel"""
+    return not await missing_channels(client, user_id)
+
+
+class InviteLinkPool:
+    """
+    Join-request invite links for the force-sub channels, created up front
+    so prompts are served from memory. A background task adds a fresh link
+    to each channel and revokes the oldest one before it expires, so the
+    channel never collects more than `size` links from the bot.
+    """
+
+    def __init__(self, size: int = INVITE_LINK_POOL_SIZE, ttl: int = INVITE_LINK_TTL):
+        self.size = max(1, size)
+        self.ttl = ttl
+        self.links = {}
+        self.client = None
+        self._turn = 0
+        self._task = None
+
+    def get(self, channel_id: int):
+        """A live link for `channel_id`, rotating through the pool; None if there is none"""
+        now = time.time()
+        live = [link for expires_at, link in self.links.get(channel_id, ()) if expires_at > now]
+        if not live:
+            return None
+        self._turn += 1
+        return live[self._turn % len(live)]
+
+    async def _rotate(self, channel_id: int):
+        """Add one link to the channel's pool and retire the oldest once it is full"""
+        expires_at = time.time() + self.ttl
+        invite = await self.client.create_chat_invite_link(
+            channel_id,
+            expire_date=datetime.fromtimestamp(expires_at),
+            creates_join_request=True
+        )
+        pool = self.links.setdefault(channel_id, deque())
+        pool.append((expires_at, invite.invite_link))
+        while len(pool) > self.size:
+            await self._revoke(channel_id, pool.popleft()[1])
+
+    async def _revoke(self, channel_id: int, link: str):
         try:
+            await self.client.revoke_chat_invite_link(channel_id, link)
+        except Exception as e:
+            # It still expires on its own
+            print(f"Could not revoke invite link in {channel_id}: {e}")
+
+    async def start(self, client, channels):
+        await self.stop()
+        self.client = client
+        for channel_id in channels:
+            try:
+                for _ in range(self.size):
+                    await self._rotate(channel_id)
+            except Exception as e:
+                print(f"⚠️ Could not create join request links for {channel_id}: {e}")
+        self._task = asyncio.create_task(self._run(list(channels)))
+
+    async def stop(self):
+        """Stop rotating and revoke every link the pool handed out"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for channel_id, pool in self.links.items():
+            for _, link in pool:
+                await self._revoke(channel_id, link)
+        self.links.clear()
+
+    async def _run(self, channels):
+        # size + 1 rotations per TTL, so the oldest link is replaced before it expires
+        interval = self.ttl / (self.size + 1)
+        while True:
+            await asyncio.sleep(interval)
+            for channel_id in channels:
+                try:
+                    await self._rotate(channel_id)
+                except Exception as e:
+                    print(f"Invite link rotation failed for {channel_id}: {e}")
+
+
+invite_pool = InviteLinkPool()
 
-            msgs = await client.get_messages(
-
-                chat_id=client.db_channel.id,
-
-                message_ids=temb_ids
-
-            )
 
+async def is_subscribed(filter, client, update):
+    return await check_subscription(client, update.from_user.id)
+
+# Telegram returns at most 200 messages per get_messages call
+FETCH_CHUNK_SIZE = 200
+
+class MessageCache:
+    """Bounded LRU cache of DB channel Message objects with TTL expiry"""
+
+    def __init__(self, max_size: int = MESSAGE_CACHE_SIZE, ttl: int = MESSAGE_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, msg_id: int):
+        entry = self._data.get(msg_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires, msg = entry
+        if expires < time.monotonic():
+            del self._data[msg_id]
+            self.misses += 1
+            return None
+        self._data.move_to_end(msg_id)
+        self.hits += 1
+        return msg
+
+    def put(self, msg):
+        if self.max_size <= 0:
+            return
+        self._data[msg.id] = (time.monotonic() + self.ttl, msg)
+        self._data.move_to_end(msg.id)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, *msg_ids):
+        for msg_id in msg_ids:
+            self._data.pop(msg_id, None)
+
+    def clear(self):
+        self._data.clear()
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __str__(self):
+        return (f"{len(self)}/{self.max_size} cached, {self.hits} hits, {self.misses} misses "
+                f"({self.hit_rate:.0%} hit rate), {self.evictions} evicted")
+
+
+message_cache = MessageCache()
+
+# Caps get_messages calls in flight across every /start click, created on first use
+_fetch_slots = None
+
+def _fetch_semaphore():
+    global _fetch_slots
+    if _fetch_slots is None:
+        _fetch_slots = asyncio.Semaphore(max(1, FETCH_CONCURRENCY))
+    return _fetch_slots
+
+async def _fetch_chunk(client, chunk, retries=FETCH_RETRIES, semaphore=None):
+    """
+    Fetch one chunk of ids, retrying with exponential backoff. None if every
+    attempt failed. Each call holds `semaphore`, the shared FETCH_CONCURRENCY
+    one unless the caller brings its own.
+    """
+    semaphore = semaphore or _fetch_semaphore()
+    delay = 1
+    for attempt in range(retries + 1):
+        try:
+            async with semaphore:
+                msgs = await client.get_messages(
+                    chat_id=client.db_channel.id,
+                    message_ids=list(chunk)
+                )
+            return msgs if isinstance(msgs, list) else [msgs]
         except FloodWait as e:
+            await asyncio.sleep(e.value)
+        except Exception as e:
+            print(f"Fetching messages {chunk[0]}..{chunk[-1]} failed (attempt {attempt + 1}): {e}")
+            if attempt < retries:
+                await asyncio.sleep(delay)
+                delay *= 2
+    return None
+
+async def _load_chunk(client, chunk, retries=FETCH_RETRIES, use_cache=True, failed=None, semaphore=None):
+    """
+    Return {id: Message} for one chunk, serving what it can from message_cache.
+    Ids whose fetch failed every retry are appended to `failed` if given.
+    """
+    found = {}
+    to_fetch = []
+    for msg_id in chunk:
+        msg = message_cache.get(msg_id) if use_cache else None
+        if msg is not None:
+            found[msg_id] = msg
+        else:
+            to_fetch.append(msg_id)
+
+    if to_fetch:
+        msgs = await _fetch_chunk(client, to_fetch, retries, semaphore)
+        if msgs is None:
+            if failed is not None:
+                failed.extend(to_fetch)
+            return found
+        for msg in msgs:
+            if msg and not msg.empty:
+                found[msg.id] = msg
+                if use_cache:
+                    message_cache.put(msg)
+    return found
+
+async def fetch_messages(client, message_ids, semaphore=None, retries=FETCH_RETRIES, use_cache=True, failed=None):
+    """
+    Fetch DB channel messages in concurrent 200-id chunks, at most
+    FETCH_CONCURRENCY in flight across all callers unless `semaphore` is given.
+    Returns (messages, missing_ids); messages keep the order of message_ids
+    and missing_ids lists ids that were deleted or empty. Ids from chunks
+    that failed every retry go to `failed` if given, else into missing_ids.
+    """
+    chunks = [message_ids[i:i + FETCH_CHUNK_SIZE] for i in range(0, len(message_ids), FETCH_CHUNK_SIZE)]
+
+    found = {}
+    chunk_failed = []
+    loads = (_load_chunk(client, chunk, retries, use_cache, chunk_failed, semaphore) for chunk in chunks)
+    for chunk_found in await asyncio.gather(*loads):
+        found.update(chunk_found)
+
+    messages = [found[msg_id] for msg_id in message_ids if msg_id in found]
+    if failed is None:
+        missing = [msg_id for msg_id in message_ids if msg_id not in found]
+    else:
+        failed_ids = set(chunk_failed)
+        failed.extend(msg_id for msg_id in message_ids if msg_id in failed_ids)
+        missing = [msg_id for msg_id in message_ids if msg_id not in found and msg_id not in failed_ids]
+    return messages, missing
+
+async def _prefetch_chunks(message_ids, load):
+    """
+    Yield (chunk, await load(chunk)) for each 200-id chunk of message_ids,
+    starting the next load while the caller is still working on this one.
+    """
+    chunks = [message_ids[i:i + FETCH_CHUNK_SIZE] for i in range(0, len(message_ids), FETCH_CHUNK_SIZE)]
+    if not chunks:
+        return
+    pending = asyncio.ensure_future(load(chunks[0]))
+    try:
+        for i, chunk in enumerate(chunks):
+            loaded = await pending
+            if i + 1 < len(chunks):
+                pending = asyncio.ensure_future(load(chunks[i + 1]))
+            yield chunk, loaded
+    finally:
+        if not pending.done():
+            pending.cancel()
+
+# ===========================
+# FILE INDEX
+# ===========================
+
+# Media kinds that can be resent by file_id with send_cached_media
+CACHED_MEDIA_TYPES = ('document', 'video', 'audio', 'photo', 'animation', 'voice', 'video_note', 'sticker')
+
+# Button actions a record can store; web app, login and game buttons only survive a copy
+RECORD_BUTTON_FIELDS = ('url', 'callback_data', 'switch_inline_query', 'switch_inline_query_current_chat', 'user_id')
+
+# Errors sending a stored file_id that mean the record is stale, not that the chat is unreachable
+STALE_FILE_ERRORS = (FileReferenceExpired, FileReferenceInvalid, FileIdInvalid, MediaEmpty)
+
+def build_file_record(msg, chat_id: int):
+    """
+    Compact delivery record for a DB channel message, or None when the
+    message can only be delivered by copying it (polls, locations, ...).
+    """
+    record = {
+        'id': msg.id,
+        'chat_id': chat_id,
+        'caption': msg.caption.html if msg.caption else "",
+        'reply_markup': None,
+    }
+
+    markup = msg.reply_markup
+    if markup and getattr(markup, 'inline_keyboard', None):
+        rows = []
+        for row in markup.inline_keyboard:
+            buttons = []
+            for b in row:
+                action = {k: getattr(b, k, None) for k in RECORD_BUTTON_FIELDS}
+                action = {k: v for k, v in action.items() if v is not None}
+                if not action:
+                    return None
+                buttons.append({'text': b.text, **action})
+            rows.append(buttons)
+        record['reply_markup'] = rows
+
+    for media_type in CACHED_MEDIA_TYPES:
+        media = getattr(msg, media_type, None)
+        if media:
+            record['type'] = media_type
+            record['file_id'] = media.file_id
+            record['file_name'] = getattr(media, 'file_name', None)
+            return record
+
+    if msg.text:
+        record['type'] = 'text'
+        record['text'] = msg.text.html
+        return record
+
+    return None
+
+def record_reply_markup(record):
+    if not record.get('reply_markup'):
+        return None
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(**button) for button in row]
+        for row in record['reply_markup']
+    ])
 
-            await asyncio.sleep(e.x)
-
-            msgs = await client.get_messages(
-
-                chat_id=client.db_channel.id,
-
-                message_ids=temb_ids
-
-            )
-
-        except:
-
-            pass
-
-        total_messages += len(temb_ids)
+async def send_file_record(client, chat_id: int, record: dict, caption: str, reply_markup, protect_content: bool):
+    """
+    Resend an indexed file without touching the DB channel. When the stored
+    file_id has gone stale the record is dropped, the post is copied from
+    the DB channel instead and indexed again.
+    """
+    if record['type'] == 'text':
+        return await client.send_message(
+            chat_id=chat_id,
+            text=record['text'],
+            parse_mode=ParseMode.HTML,
+            reply_markup=reply_markup,
+            protect_content=protect_content,
+            disable_web_page_preview=True
+        )
+    try:
+        return await client.send_cached_media(
+            chat_id=chat_id,
+            file_id=record['file_id'],
+            caption=caption,
+            parse_mode=ParseMode.HTML,
+            reply_markup=reply_markup,
+            protect_content=protect_content
+        )
+    except STALE_FILE_ERRORS as e:
+        print(f"Stale file index record {record['id']}: {e}")
+        stale_error = e
 
-        messages.extend(msgs)
+    try:
+        await delete_file_records([record['id']])
+    except Exception as e:
+        print(f"Removing stale file index record failed: {e}")
+    message_cache.invalidate(record['id'])
+    msg = (await _load_chunk(client, [record['id']])).get(record['id'])
+    if msg is None:
+        raise stale_error
+    await index_messages([msg], record['chat_id'])
+    return await msg.copy(
+        chat_id=chat_id,
+        caption=caption,
+        parse_mode=ParseMode.HTML,
+        reply_markup=reply_markup,
+        protect_content=protect_content
+    )
 
-    return messages
+async def index_messages(messages, chat_id: int):
+    """Store delivery records for DB channel messages, ignoring failures"""
+    records = [r for r in (build_file_record(msg, chat_id) for msg in messages) if r]
+    try:
+        await save_file_records(records)
+    except Exception as e:
+        print(f"Saving file index failed: {e}")
+    return records
+
+async def iter_delivery_items(client, message_ids, missing=None):
+    """
+    Yield what to deliver for message_ids in order, one 200-id chunk at a
+    time with the next chunk prefetched: indexed delivery records where
+    possible, Message objects for the rest. Only ids missing from the index
+    hit get_messages; those are indexed on the way through. Ids that could
+    not be fetched are appended to `missing` if given.
+    """
+    chat_id = client.db_channel.id
+
+    async def load(chunk):
+        try:
+            records = await get_file_records(chunk)
+        except Exception as e:
+            print(f"Reading file index failed: {e}")
+            records = {}
+        items = {msg_id: r for msg_id, r in records.items() if r.get('chat_id') == chat_id}
+
+        to_fetch = [msg_id for msg_id in chunk if msg_id not in items]
+        if to_fetch:
+            found = await _load_chunk(client, to_fetch)
+            items.update(found)
+            for record in await index_messages(found.values(), chat_id):
+                items[record['id']] = record
+        return items
+
+    # The next chunk loads while this one is being delivered
+    async for chunk, items in _prefetch_chunks(message_ids, load):
+        for msg_id in chunk:
+            if msg_id in items:
+                yield items[msg_id]
+            elif missing is not None:
+                missing.append(msg_id)
 
 async def get_message_id(client, message):
 
@@ -128,33 +558,41 @@ async def get_message_id(client, message):
 
     elif message.text:
 
-        pattern = "https://t.me/(?:c/)?(.*)/(\d+)"
+        return get_link_message_id(client, message.text)
 
-        matches = re.match(pattern,message.text)
+    else:
 
-        if not matches:
+        return 0
 
-            return 0
+def get_link_message_id(client, text: str) -> int:
 
-        channel_id = matches.group(1)
+    """Message id from a DB channel post link, 0 for other text or another channel's link"""
 
-        msg_id = int(matches.group(2))
+    pattern = "https://t.me/(?:c/)?(.*)/(\d+)"
 
-        if channel_id.isdigit():
+    matches = re.match(pattern,text)
 
-            if f"-100{channel_id}" == str(client.db_channel.id):
+    if not matches:
 
-                return msg_id
+        return 0
 
-        else:
+    channel_id = matches.group(1)
+
+    msg_id = int(matches.group(2))
 
-            if channel_id == client.db_channel.username:
+    if channel_id.isdigit():
 
-                return msg_id
+        if f"-100{channel_id}" == str(client.db_channel.id):
+
+            return msg_id
 
     else:
 
-        return 0
+        if channel_id == client.db_channel.username:
+
+            return msg_id
+
+    return 0
 
 def get_readable_time(seconds: int) -> str:
 
@@ -196,53 +634,17 @@ def get_readable_time(seconds: int) -> str:
 
     return up_time
 
-async def delete_file(messages, client, process, original_link):
-
-    """Delete files after timeout and provide re-send button"""
-
-    await asyncio.sleep(AUTO_DELETE_TIME)
-
-    for msg in messages:
-
-        try:
-
-            await client.delete_messages(chat_id=msg.chat.id, message_ids=[msg.id])
-
-        except FloodWait as e:
-
-            await asyncio.sleep(e.x)
-
-        except Exception as e:
-
-            print(f"The attempt to delete the media {msg.id} was unsuccessful: {e}")
-
-    # Create re-send button
-
-    reply_markup = InlineKeyboardMarkup([
-
-        [InlineKeyboardButton("🔄 Get File Again", url=original_link)]
-
-    ])
-
-    await process.edit_text(
-
-        f"{AUTO_DEL_SUCCESS_MSG}\n\n<b>Want to access the file again?</b>\n<i>Click the button below:</i>",
-
-        reply_markup=reply_markup
-
-    )
-
 async def shorten_url(url: str) -> str:
 
     """Shorten URL using configured shortener service"""
 
     try:
 
-        from database.database import get_setting
+        from database.database import get_setting_async
 
         
 
-        enabled = get_setting('shortener_enabled', 'False')
+        enabled = await get_setting_async('shortener_enabled', 'False')
 
         if enabled != 'True':
 
@@ -250,9 +652,9 @@ async def shorten_url(url: str) -> str:
 
         
 
-        api_key = get_setting('shortener_api', None)
+        api_key = await get_setting_async('shortener_api', None)
 
-        site_url = get_setting('shortener_site', None)
+        site_url = await get_setting_async('shortener_site', None)
 
         
 
@@ -342,4 +744,504 @@ async def shorten_url(url: str) -> str:
 
         return url
 
+
+# ===========================
+# DELIVERY ENGINE
+# ===========================
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, up to `capacity` stored"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = None
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def pause(self, seconds: float):
+        """Stop handing out tokens for `seconds` (used on FloodWait)"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+
+    @property
+    def paused(self) -> bool:
+        return time.monotonic() < self.paused_until
+
+    async def acquire(self):
+        # Created lazily so the lock binds to the running bot loop
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class DeliveryReport:
+    """Outcome of one DeliveryEngine.deliver() call"""
+
+    def __init__(self):
+        self.results = []
+        self.sent = 0
+        self.failed = 0
+        self.flood_waits = 0
+        self.started = time.monotonic()
+        self.finished = None
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def rate(self) -> float:
+        """Throughput in files per second"""
+        return self.sent / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __str__(self):
+        return f"{self.sent} sent, {self.failed} failed in {self.elapsed:.1f}s ({self.rate:.1f} files/s)"
+
+
+class DeliveryEngine:
+    """
+    Sends messages with bounded concurrency instead of a fixed sleep.
+    Every chat gets its own lane (token bucket); all lanes share a global
+    bucket. A FloodWait pauses only the lane of the chat that raised it.
+    """
+
+    def __init__(self, concurrency: int = DELIVERY_CONCURRENCY,
+                 lane_concurrency: int = DELIVERY_LANE_CONCURRENCY,
+                 chat_rate: float = DELIVERY_CHAT_RATE, chat_burst: int = DELIVERY_CHAT_BURST,
+                 global_rate: float = DELIVERY_GLOBAL_RATE, global_burst: int = DELIVERY_GLOBAL_BURST,
+                 max_retries: int = DELIVERY_MAX_RETRIES):
+        self.lane_concurrency = max(1, lane_concurrency)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.concurrency = max(1, concurrency)
+        self._slots = None
+        self._lanes = {}
+        self._lane_users = {}
+
+    def lane(self, chat_id: int) -> TokenBucket:
+        bucket = self._lanes.get(chat_id)
+        if bucket is None:
+            if len(self._lanes) > 10000:
+                # Drop lanes left behind by FloodWaits that have expired
+                for stale in [cid for cid, b in self._lanes.items()
+                              if not b.paused and cid not in self._lane_users]:
+                    del self._lanes[stale]
+            bucket = self._lanes[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    def _release_lane(self, chat_id: int):
+        self._lane_users[chat_id] -= 1
+        if self._lane_users[chat_id] <= 0:
+            del self._lane_users[chat_id]
+            bucket = self._lanes.get(chat_id)
+            # Keep a paused lane around so the next request still honours the FloodWait
+            if bucket is not None and not bucket.paused:
+                del self._lanes[chat_id]
+
+    async def send(self, chat_id: int, send_func, item, report: DeliveryReport = None):
+        """Send one item through the chat's lane, retrying after FloodWait"""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        bucket = self.lane(chat_id)
+        for attempt in range(self.max_retries + 1):
+            await bucket.acquire()
+            await self.global_bucket.acquire()
+            try:
+                async with self._slots:
+                    return await send_func(item)
+            except FloodWait as e:
+                if report is not None:
+                    report.flood_waits += 1
+                print(f"   ⏳ FloodWait in chat {chat_id}: {e.value}s (attempt {attempt + 1})")
+                bucket.pause(e.value)
+                if attempt == self.max_retries:
+                    raise
+
+    async def deliver(self, chat_id: int, items, send_func) -> DeliveryReport:
+        """
+        Send every item of `items` (iterable or async iterable) to `chat_id`
+        with `send_func(item)`. Results keep the input order (None where
+        sending failed).
+        """
+        report = DeliveryReport()
+        queue = asyncio.Queue(maxsize=self.lane_concurrency * 2)
+        results = {}
+
+        async def producer():
+            try:
+                if hasattr(items, '__aiter__'):
+                    # Async sources are pulled only as fast as the lane drains
+                    idx = 0
+                    async for item in items:
+                        await queue.put((idx, item))
+                        idx += 1
+                else:
+                    for idx, item in enumerate(items):
+                        await queue.put((idx, item))
+            finally:
+                for _ in range(self.lane_concurrency):
+                    await queue.put(None)
+
+        async def worker():
+            while True:
+                job = await queue.get()
+                if job is None:
+                    return
+                idx, item = job
+                try:
+                    results[idx] = await self.send(chat_id, send_func, item, report)
+                    report.sent += 1
+                except Exception as e:
+                    results[idx] = None
+                    report.failed += 1
+                    print(f"   ❌ Error sending item {idx + 1} to {chat_id}: {e}")
+
+        self._lane_users[chat_id] = self._lane_users.get(chat_id, 0) + 1
+        try:
+            await asyncio.gather(producer(), *(worker() for _ in range(self.lane_concurrency)))
+        finally:
+            self._release_lane(chat_id)
+
+        report.results = [results[idx] for idx in sorted(results)]
+        report.finished = time.monotonic()
+        return report
+
+
+delivery_engine = DeliveryEngine()
+
+
+# ===========================
+# AUTO DELETE QUEUE
+# ===========================
+
+# Telegram accepts at most 100 ids per delete_messages call
+DELETE_CHUNK_SIZE = 100
+
+# A job whose delete failed is re-armed this much later, doubling per attempt, up to DELETE_MAX_ATTEMPTS
+DELETE_RETRY_DELAY = 300
+DELETE_MAX_ATTEMPTS = 5
+
+
+async def delete_messages_bulk(client, targets: dict, retries: int = DELIVERY_MAX_RETRIES) -> dict:
+    """
+    Delete {chat_id: [message_ids]} with as few calls as the API allows,
+    waiting out FloodWaits instead of skipping. Returns the ids that could
+    not be deleted as {chat_id: [message_ids]}, empty when all went through.
+    """
+    started = time.monotonic()
+    deleted = calls = 0
+    failed = defaultdict(list)
+    for chat_id, message_ids in targets.items():
+        for start in range(0, len(message_ids), DELETE_CHUNK_SIZE):
+            chunk = message_ids[start:start + DELETE_CHUNK_SIZE]
+            for attempt in range(retries + 1):
+                await delivery_engine.global_bucket.acquire()
+                calls += 1
+                try:
+                    await client.delete_messages(chat_id=chat_id, message_ids=chunk)
+                    deleted += len(chunk)
+                    break
+                except FloodWait as e:
+                    if attempt == retries:
+                        print(f"Gave up deleting {len(chunk)} messages in {chat_id} after FloodWaits")
+                        failed[chat_id].extend(chunk)
+                        break
+                    await asyncio.sleep(e.value)
+                except Exception as e:
+                    print(f"The attempt to delete {len(chunk)} messages in {chat_id} was unsuccessful: {e}")
+                    failed[chat_id].extend(chunk)
+                    break
+    print(f"🗑️ Deleted {deleted} messages in {len(targets)} chats with {calls} calls "
+          f"({time.monotonic() - started:.2f}s)")
+    return dict(failed)
+
+
+class DeletionQueue:
+    """
+    Durable auto-delete scheduler. Each delivery becomes one row
+    (chat_id, message_ids, due_at) in the database and one heap entry in
+    memory; a single worker sleeps until the earliest due time. Pending
+    deletions hold no coroutines or Message objects and are re-armed from
+    the database when the bot starts.
+    """
+
+    def __init__(self):
+        self.heap = []
+        self.client = None
+        self._worker = None
+        self._wakeup = None
+
+    def __len__(self):
+        return len(self.heap)
+
+    def _push(self, job: dict):
+        heapq.heappush(self.heap, (job['due_at'], job['id'], job))
+        # Wake the worker only if this job is now the earliest one
+        if self._wakeup is not None and self.heap[0][1] == job['id']:
+            self._wakeup.set()
+
+    async def schedule(self, chat_id: int, message_ids, delay: float,
+                       notice_id: int = None, link: str = None):
+        """Delete `message_ids` from `chat_id` after `delay` seconds, then update the notice"""
+        job = {
+            'id': secrets.token_hex(8),
+            'chat_id': chat_id,
+            'message_ids': list(message_ids),
+            'due_at': time.time() + delay,
+            'notice_id': notice_id,
+            'link': link,
+        }
+        try:
+            await add_deletion(job)
+        except Exception as e:
+            # Still delete on time, it just won't survive a restart
+            print(f"Could not persist auto-delete job: {e}")
+        self._push(job)
+
+    async def start(self, client):
+        self.client = client
+        try:
+            jobs = await get_deletions()
+        except Exception as e:
+            print(f"⚠️ Could not load pending auto-deletes: {e}")
+            jobs = []
+        # Jobs scheduled while the bot was starting are already in the heap
+        queued = {entry[1] for entry in self.heap}
+        for job in jobs:
+            if job['id'] not in queued:
+                heapq.heappush(self.heap, (job['due_at'], job['id'], job))
+        if jobs:
+            print(f"🗑️ Re-armed {len(jobs)} pending auto-deletes")
+        self._wakeup = asyncio.Event()
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+
+    async def _run(self):
+        while True:
+            delay = self.heap[0][0] - time.time() if self.heap else None
+            if delay is None or delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            now = time.time()
+            due = []
+            while self.heap and self.heap[0][0] <= now:
+                due.append(heapq.heappop(self.heap)[2])
+            try:
+                await self._expire(due)
+            except Exception as e:
+                print(f"Auto-delete batch failed: {e}")
+
+    async def _expire(self, jobs):
+        by_chat = defaultdict(list)
+        for job in jobs:
+            by_chat[job['chat_id']].extend(job['message_ids'])
+        failed = await delete_messages_bulk(self.client, by_chat)
+
+        retries = []
+        for job in jobs:
+            failed_ids = set(failed.get(job['chat_id'], ()))
+            remaining = [msg_id for msg_id in job['message_ids'] if msg_id in failed_ids]
+            if not remaining:
+                if job.get('notice_id'):
+                    await self._update_notice(job)
+                continue
+            attempts = job.get('attempts', 0) + 1
+            if attempts >= DELETE_MAX_ATTEMPTS:
+                print(f"Gave up auto-deleting {len(remaining)} messages in {job['chat_id']} after {attempts} attempts")
+                continue
+            retries.append(dict(
+                job,
+                id=secrets.token_hex(8),
+                message_ids=remaining,
+                due_at=time.time() + DELETE_RETRY_DELAY * 2 ** (attempts - 1),
+                attempts=attempts,
+            ))
+
+        # Store the retries before dropping the rows they replace, so a crash in between loses nothing
+        for job in retries:
+            try:
+                await add_deletion(job)
+            except Exception as e:
+                print(f"Could not persist auto-delete retry: {e}")
+            self._push(job)
+
+        await remove_deletions([job['id'] for job in jobs])
+
+    async def _update_notice(self, job: dict):
+        reply_markup = None
+        text = runtime.auto_del_success_msg
+        if job.get('link'):
+            reply_markup = InlineKeyboardMarkup([
+                [InlineKeyboardButton("🔄 Get File Again", url=job['link'])]
+            ])
+            text += "\n\n<b>Want to access the file again?</b>\n<i>Click the button below:</i>"
+        await delivery_engine.global_bucket.acquire()
+        try:
+            await self.client.edit_message_text(
+                job['chat_id'], job['notice_id'], text, reply_markup=reply_markup
+            )
+        except Exception as e:
+            print(f"Could not update auto-delete notice in {job['chat_id']}: {e}")
+
+
+deletion_queue = DeletionQueue()
+
+
+# ===========================
+# BATCH LINKS
+# ===========================
+
+BATCH_TOKEN_BYTES = 6
+
+# Expired batches are only removed when clicked, so creating one sweeps the rest at most this often
+BATCH_PURGE_INTERVAL = 3600
+
+
+class BatchCache:
+    """Bounded LRU of stored batch manifests so repeated clicks skip the database"""
+
+    def __init__(self, max_size: int = BATCH_CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, token: str):
+        manifest = self._data.get(token)
+        if manifest is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(token)
+        self.hits += 1
+        return manifest
+
+    def put(self, token: str, manifest: dict):
+        if self.max_size <= 0:
+            return
+        self._data[token] = manifest
+        self._data.move_to_end(token)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def invalidate(self, token: str):
+        self._data.pop(token, None)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __str__(self):
+        return f"{len(self)}/{self.max_size} cached, {self.hits} hits, {self.misses} misses ({self.hit_rate:.0%} hit rate)"
+
+
+batch_cache = BatchCache()
+_last_batch_purge = 0.0
+
+
+def _batch_ids(message_ids) -> list:
+    ids = sorted(set(message_ids))
+    if not ids or ids[0] <= 0:
+        raise LinkError("message ids must be positive")
+    return ids
+
+
+async def create_batch(message_ids, caption: str = None, protect: bool = None,
+                       expires_in: float = None) -> str:
+    """
+    Store a batch manifest and return the /start parameter for it.
+    `caption` replaces every file's caption, `protect` overrides
+    PROTECT_CONTENT and `expires_in` (seconds) limits how long the link works.
+    """
+    manifest = {'ids': _batch_ids(message_ids), 'created_at': time.time()}
+    if caption:
+        manifest['caption'] = caption
+    if protect is not None:
+        manifest['protect'] = protect
+    if expires_in:
+        manifest['expires_at'] = time.time() + expires_in
+
+    token = secrets.token_bytes(BATCH_TOKEN_BYTES)
+    await save_batch(token.hex(), manifest)
+    batch_cache.put(token.hex(), manifest)
+    await purge_expired_batches()
+    return encode_batch_token(token)
+
+
+async def purge_expired_batches():
+    """Delete expired batches nobody clicked again, at most once per BATCH_PURGE_INTERVAL"""
+    global _last_batch_purge
+    now = time.time()
+    if now - _last_batch_purge < BATCH_PURGE_INTERVAL:
+        return
+    _last_batch_purge = now
+    try:
+        await delete_expired_batches(now)
+    except Exception as e:
+        print(f"Purging expired batches failed: {e}")
+
+
+async def batch_parameter(message_ids) -> str:
+    """
+    /start parameter for exactly `message_ids`. Sets that do not fit in a
+    deep link are stored as a manifest and the link carries its token.
+    """
+    ids = _batch_ids(message_ids)
+    if len(ids) <= MAX_SET_SIZE:
+        parameter = encode_ids(ids)
+        if len(parameter) <= MAX_PARAMETER_LENGTH:
+            return parameter
+    return await create_batch(ids)
+
+
+async def get_batch_manifest(token: str):
+    """Manifest behind a batch token, None if it is unknown or expired"""
+    manifest = batch_cache.get(token)
+    if manifest is None:
+        manifest = await get_batch(token)
+        if manifest is None:
+            return None
+        batch_cache.put(token, manifest)
+
+    if manifest.get('expires_at') and manifest['expires_at'] < time.time():
+        batch_cache.invalidate(token)
+        try:
+            await delete_batch(token)
+        except Exception as e:
+            print(f"Could not delete expired batch {token}: {e}")
+        return None
+    return manifest
+
+
 subscribed = filters.create(is_subscribed)
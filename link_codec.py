@@ -0,0 +1,242 @@
+# link_codec.py
+# Compact /start payloads: a version byte and varint-packed message ids, base64url encoded
+#
+# v1 layout: [VERSION] [header = channel_slot << 3 | kind] [kind specific varints]
+#   SINGLE: message_id
+#   RANGE:  first_id, zigzag(last_id - first_id)
+#   SET:    (gap, run_length - 1) pairs; gap counts the ids skipped since the previous run
+#   BATCH:  raw token bytes of a batch stored in the database
+#
+# Links made before v1 decode to ASCII "get-<id*abs(channel)>[-<id*abs(channel)>]"
+# and are still accepted, so posts shared earlier keep working.
+
+import base64
+from typing import List, NamedTuple, Optional, Union
+
+VERSION = 1
+
+# Payload kinds, the low 3 bits of the header
+SINGLE = 0
+RANGE = 1
+SET = 2
+BATCH = 3
+
+# Telegram rejects deep-link parameters longer than this
+MAX_PARAMETER_LENGTH = 64
+
+# Upper bound on ids a SET link may expand to, larger sets go through a stored batch
+MAX_SET_SIZE = 10000
+
+LEGACY_PREFIX = b"get-"
+
+
+class LinkError(ValueError):
+    """The /start parameter is not a link this bot made"""
+
+
+class DecodedLink(NamedTuple):
+    message_ids: Union[range, List[int]]
+    # 0 is the DB channel; links never carry the channel id itself
+    channel_slot: int = 0
+    legacy: bool = False
+    # Hex token of a stored batch; message_ids is empty until it is looked up
+    batch_token: Optional[str] = None
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def _b64decode(parameter: str) -> bytes:
+    parameter = parameter.strip("=")
+    try:
+        return base64.urlsafe_b64decode(parameter + "=" * (-len(parameter) % 4))
+    except ValueError as e:
+        raise LinkError(f"not base64: {e}")
+
+
+def _put_varint(out: bytearray, value: int):
+    if value < 0:
+        raise LinkError(f"cannot pack negative value {value}")
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _zigzag(value: int) -> int:
+    return value << 1 if value >= 0 else (-value << 1) - 1
+
+
+def _unzigzag(value: int) -> int:
+    return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+
+class _Reader:
+    __slots__ = ('data', 'pos')
+
+    def __init__(self, data: bytes, pos: int = 0):
+        self.data = data
+        self.pos = pos
+
+    def varint(self) -> int:
+        data = self.data
+        result = shift = 0
+        while True:
+            if self.pos >= len(data):
+                raise LinkError("truncated link")
+            byte = data[self.pos]
+            self.pos += 1
+            result |= (byte & 0x7f) << shift
+            if not byte & 0x80:
+                return result
+            shift += 7
+            if shift > 63:
+                raise LinkError("varint too long")
+
+    def done(self):
+        if self.pos != len(self.data):
+            raise LinkError("trailing bytes in link")
+
+
+def _id_range(first_id: int, last_id: int) -> range:
+    """Inclusive range in either direction, reverse batches are delivered newest first"""
+    step = 1 if last_id >= first_id else -1
+    return range(first_id, last_id + step, step)
+
+
+def encode_link(first_id: int, last_id: Optional[int] = None, channel_slot: int = 0) -> str:
+    """/start parameter for one message, or for every message from first_id to last_id"""
+    if first_id <= 0 or (last_id is not None and last_id <= 0):
+        raise LinkError("message ids must be positive")
+    out = bytearray((VERSION,))
+    if last_id is None or last_id == first_id:
+        _put_varint(out, channel_slot << 3 | SINGLE)
+        _put_varint(out, first_id)
+    else:
+        _put_varint(out, channel_slot << 3 | RANGE)
+        _put_varint(out, first_id)
+        _put_varint(out, _zigzag(last_id - first_id))
+    return _b64encode(bytes(out))
+
+
+def encode_ids(message_ids, channel_slot: int = 0) -> str:
+    """
+    /start parameter for exactly `message_ids` (any order, duplicates
+    ignored). Contiguous ids become a RANGE, anything else a SET of runs.
+    """
+    ids = sorted(set(message_ids))
+    if not ids:
+        raise LinkError("no message ids")
+    if ids[0] <= 0:
+        raise LinkError("message ids must be positive")
+    if len(ids) > MAX_SET_SIZE:
+        raise LinkError(f"more than {MAX_SET_SIZE} ids, store the batch instead")
+    if ids[-1] - ids[0] + 1 == len(ids):
+        return encode_link(ids[0], ids[-1])
+
+    out = bytearray((VERSION,))
+    _put_varint(out, channel_slot << 3 | SET)
+    previous = 0
+    run_start = ids[0]
+    for current, following in zip(ids, ids[1:] + [None]):
+        if following == current + 1:
+            continue
+        _put_varint(out, run_start - previous - 1)
+        _put_varint(out, current - run_start)
+        previous = current
+        run_start = following
+    return _b64encode(bytes(out))
+
+
+def encode_batch_token(token: bytes, channel_slot: int = 0) -> str:
+    """/start parameter pointing at a batch stored under `token`"""
+    if not token:
+        raise LinkError("empty batch token")
+    out = bytearray((VERSION,))
+    _put_varint(out, channel_slot << 3 | BATCH)
+    out += token
+    return _b64encode(bytes(out))
+
+
+def _decode_set(reader: _Reader) -> List[int]:
+    ids = []
+    previous = 0
+    while reader.pos < len(reader.data):
+        run_start = previous + reader.varint() + 1
+        run_length = reader.varint() + 1
+        if len(ids) + run_length > MAX_SET_SIZE:
+            raise LinkError("link expands to too many ids")
+        ids.extend(range(run_start, run_start + run_length))
+        previous = ids[-1]
+    if not ids:
+        raise LinkError("empty id set")
+    return ids
+
+
+def _decode_v1(data: bytes) -> DecodedLink:
+    reader = _Reader(data, 1)
+    header = reader.varint()
+    kind, channel_slot = header & 0x7, header >> 3
+    if kind == SET:
+        return DecodedLink(_decode_set(reader), channel_slot)
+    if kind == BATCH:
+        token = data[reader.pos:]
+        if not token:
+            raise LinkError("empty batch token")
+        return DecodedLink([], channel_slot, batch_token=token.hex())
+    first_id = reader.varint()
+    if kind == SINGLE:
+        message_ids = [first_id]
+    elif kind == RANGE:
+        message_ids = _id_range(first_id, first_id + _unzigzag(reader.varint()))
+    else:
+        raise LinkError(f"unknown link kind {kind}")
+    reader.done()
+    if first_id <= 0 or message_ids[-1] <= 0:
+        raise LinkError("message ids must be positive")
+    return DecodedLink(message_ids, channel_slot)
+
+
+def _decode_legacy(data: bytes, channel_id: int) -> DecodedLink:
+    parts = data.decode("ascii", "replace").split("-")
+    if len(parts) not in (2, 3):
+        raise LinkError(f"invalid legacy link: {data[:32]!r}")
+    divisor = abs(channel_id)
+    try:
+        ids = [int(part) // divisor for part in parts[1:]]
+    except ValueError:
+        raise LinkError(f"invalid legacy link: {data[:32]!r}")
+    if min(ids) <= 0:
+        raise LinkError("message ids must be positive")
+    if len(ids) == 1:
+        return DecodedLink([ids[0]], legacy=True)
+    return DecodedLink(_id_range(ids[0], ids[1]), legacy=True)
+
+
+def decode_link(parameter: str, channel_id: int) -> DecodedLink:
+    """
+    Message ids behind a /start parameter. `channel_id` is the DB channel,
+    only needed to unscramble links from before the binary format.
+    """
+    data = _b64decode(parameter)
+    if not data:
+        raise LinkError("empty link")
+    if data[0] == VERSION:
+        return _decode_v1(data)
+    if data.startswith(LEGACY_PREFIX):
+        return _decode_legacy(data, channel_id)
+    raise LinkError(f"unknown link version {data[0]}")
+
+
+def canonical_parameter(link: DecodedLink) -> str:
+    """
+    The v1 parameter for a decoded link, so a legacy link and a v1 link to
+    the same messages (or the same stored batch) map to one string
+    """
+    if link.batch_token:
+        return encode_batch_token(bytes.fromhex(link.batch_token), link.channel_slot)
+    message_ids = link.message_ids
+    if isinstance(message_ids, range):
+        return encode_link(message_ids[0], message_ids[-1], link.channel_slot)
+    return encode_ids(message_ids, link.channel_slot)
@@ -0,0 +1,413 @@
+# plugins/broadcast.py
+# Broadcast a message to every user through a rate-limited worker pool
+
+import time
+import secrets
+import asyncio
+from pyrogram import Client, filters
+from pyrogram.types import Message
+from pyrogram.errors import FloodWait, UserIsBlocked, InputUserDeactivated
+
+from bot import Bot
+from config import (OWNER_ID, ADMINS, BROADCAST_WORKERS, BROADCAST_RATE, BROADCAST_MIN_RATE,
+                    BROADCAST_CHECKPOINT_EVERY)
+from helper_func import TokenBucket, delivery_engine, get_readable_time
+from database.database import (iter_userbase, count_users, del_users, save_checkpoint,
+                               get_checkpoint, list_checkpoints)
+
+CHECKPOINT_PREFIX = 'broadcast:'
+STATUS_INTERVAL = 20
+PRUNE_BATCH = 100
+SEND_ATTEMPTS = 3
+# Clean sends needed before a slowed-down broadcast speeds up again
+RECOVER_AFTER = 500
+
+STATUS_LABELS = {
+    'running': "⏳ Running",
+    'paused': "⏸️ Paused",
+    'cancelled': "🚫 Cancelled",
+    'finished': "✅ Finished",
+}
+
+
+class BroadcastJob:
+    """
+    One broadcast, persisted as a checkpoint. Users are sent to in
+    ascending id order; `after_id` is the highest id below which every
+    user has been handled and `done_ahead` lists the few ids above it that
+    finished early, so a resumed job neither skips nor repeats anyone.
+    """
+
+    FIELDS = ('id', 'from_chat_id', 'message_id', 'status_chat', 'status_msg', 'status',
+              'after_id', 'done_ahead', 'total', 'sent', 'blocked', 'deleted', 'failed',
+              'flood_waits', 'elapsed', 'created')
+
+    def __init__(self, from_chat_id: int, message_id: int, status_chat: int, status_msg: int):
+        self.id = secrets.token_hex(3)
+        self.from_chat_id = from_chat_id
+        self.message_id = message_id
+        self.status_chat = status_chat
+        self.status_msg = status_msg
+        self.status = 'running'
+        self.after_id = None
+        self.done_ahead = []
+        self.total = 0
+        self.sent = 0
+        self.blocked = 0
+        self.deleted = 0
+        self.failed = 0
+        self.flood_waits = 0
+        # Seconds spent in earlier runs, the current run is timed separately
+        self.elapsed = 0.0
+        self.created = time.time()
+        self.run_started = None
+        self.run_base = 0
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'BroadcastJob':
+        job = cls(data['from_chat_id'], data['message_id'], data['status_chat'], data['status_msg'])
+        for field in cls.FIELDS:
+            if field in data:
+                setattr(job, field, data[field])
+        return job
+
+    def to_dict(self) -> dict:
+        data = {field: getattr(self, field) for field in self.FIELDS}
+        data['elapsed'] = self.total_elapsed
+        return data
+
+    @property
+    def checkpoint_name(self) -> str:
+        return CHECKPOINT_PREFIX + self.id
+
+    @property
+    def done(self) -> int:
+        return self.sent + self.blocked + self.deleted + self.failed
+
+    @property
+    def run_elapsed(self) -> float:
+        return time.monotonic() - self.run_started if self.run_started else 0.0
+
+    @property
+    def total_elapsed(self) -> float:
+        return self.elapsed + self.run_elapsed
+
+    @property
+    def rate(self) -> float:
+        """Users processed per second in the current run, or overall once stopped"""
+        if self.run_started is None:
+            return self.done / self.elapsed if self.elapsed > 0 else 0.0
+        elapsed = self.run_elapsed
+        return (self.done - self.run_base) / elapsed if elapsed > 0 else 0.0
+
+    def status_text(self) -> str:
+        total = max(self.total, self.done, 1)
+        if self.status == 'finished':
+            header = "✅ <b>Broadcast Complete!</b>"
+        elif self.status == 'running':
+            header = "📢 <b>Broadcasting...</b>"
+        else:
+            header = f"📢 <b>Broadcast {STATUS_LABELS[self.status]}</b>"
+        if self.status == 'running':
+            eta = int((total - self.done) / self.rate) if self.rate > 0 else 0
+            timing = f"<b>ETA:</b> <code>{get_readable_time(eta) if eta else '-'}</code>"
+        else:
+            timing = f"<b>Took:</b> <code>{get_readable_time(int(self.total_elapsed))}</code>"
+        return (
+            f"{header}\n\n"
+            f"<b>Job:</b> <code>{self.id}</code>\n"
+            f"<b>Progress:</b> <code>{self.done}/{total}</code> ({self.done * 100 // total}%)\n"
+            f"<b>Speed:</b> <code>{self.rate:.1f}</code> users/s\n"
+            f"{timing}\n\n"
+            f"📊 <b>Statistics:</b>\n"
+            f"• Successful: <code>{self.sent}</code>\n"
+            f"• Blocked: <code>{self.blocked}</code>\n"
+            f"• Deleted: <code>{self.deleted}</code>\n"
+            f"• Failed: <code>{self.failed}</code>\n"
+            f"• FloodWaits: <code>{self.flood_waits}</code>"
+        )
+
+
+class BroadcastEngine:
+    """
+    Copies a message to the whole userbase with a pool of workers. Sends
+    draw from a broadcast bucket and from the delivery engine's global
+    bucket, so broadcasts never starve /start deliveries. A FloodWait
+    pauses the bucket and cuts its rate; it recovers after a run of clean
+    sends.
+    """
+
+    def __init__(self, workers: int = BROADCAST_WORKERS, rate: float = BROADCAST_RATE,
+                 min_rate: float = BROADCAST_MIN_RATE, checkpoint_every: int = BROADCAST_CHECKPOINT_EVERY):
+        self.workers = max(1, workers)
+        self.max_rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.checkpoint_every = max(1, checkpoint_every)
+        self.bucket = TokenBucket(rate, max(1, int(rate)))
+        self.jobs = {}
+        self.tasks = {}
+        self._clean_sends = 0
+
+    def _slow_down(self, seconds: float):
+        self._clean_sends = 0
+        self.bucket.pause(seconds)
+        self.bucket.rate = max(self.min_rate, self.bucket.rate * 0.7)
+        print(f"📢 Broadcast FloodWait {seconds}s, rate lowered to {self.bucket.rate:.1f}/s")
+
+    def _speed_up(self):
+        self._clean_sends += 1
+        if self._clean_sends >= RECOVER_AFTER and self.bucket.rate < self.max_rate:
+            self._clean_sends = 0
+            self.bucket.rate = min(self.max_rate, self.bucket.rate * 1.2)
+
+    def running(self, job_id: str) -> bool:
+        task = self.tasks.get(job_id)
+        return task is not None and not task.done()
+
+    async def _send(self, client: Client, job: BroadcastJob, user_id: int) -> bool:
+        """Copy the message to one user, returns True if the user should be pruned"""
+        for attempt in range(SEND_ATTEMPTS):
+            await self.bucket.acquire()
+            await delivery_engine.global_bucket.acquire()
+            try:
+                await client.copy_message(user_id, job.from_chat_id, job.message_id)
+                job.sent += 1
+                self._speed_up()
+                return False
+            except FloodWait as e:
+                job.flood_waits += 1
+                self._slow_down(e.value)
+            except UserIsBlocked:
+                job.blocked += 1
+                return True
+            except InputUserDeactivated:
+                job.deleted += 1
+                return True
+            except Exception as e:
+                print(f"Broadcast to {user_id} failed: {e}")
+                break
+        job.failed += 1
+        return False
+
+    async def report(self, client: Client, job: BroadcastJob):
+        try:
+            await client.edit_message_text(job.status_chat, job.status_msg, job.status_text())
+        except Exception:
+            pass
+
+    async def save(self, job: BroadcastJob):
+        try:
+            await save_checkpoint(job.checkpoint_name, job.to_dict())
+        except Exception as e:
+            print(f"Could not save broadcast {job.id}: {e}")
+
+    def start(self, client: Client, job: BroadcastJob):
+        job.status = 'running'
+        self.jobs[job.id] = job
+        self.tasks[job.id] = asyncio.create_task(self._run(client, job))
+
+    async def stop(self, job: BroadcastJob, status: str):
+        """Pause or cancel a job; in-flight sends finish before it is saved"""
+        job.status = status
+        task = self.tasks.get(job.id)
+        if task is not None and not task.done():
+            await task
+        else:
+            await self.save(job)
+
+    async def shutdown(self):
+        """Save running jobs on bot stop, they resume on the next start"""
+        for job_id, task in list(self.tasks.items()):
+            if not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+
+    async def _run(self, client: Client, job: BroadcastJob):
+        if not job.total:
+            job.total = await count_users()
+        job.run_started = time.monotonic()
+        job.run_base = job.done
+        queue = asyncio.Queue(maxsize=self.workers * 2)
+        skip = set(job.done_ahead)
+        # Ids handed to workers but not finished yet
+        inflight = {}
+        finished_ahead = set(job.done_ahead)
+        state = {'last_read': job.after_id, 'saved_at': job.done}
+        prune = []
+
+        def advance_cursor():
+            if inflight:
+                lowest = min(inflight)
+                job.after_id = lowest - 1
+                job.done_ahead = sorted(uid for uid in finished_ahead if uid >= lowest)
+                finished_ahead.intersection_update(job.done_ahead)
+            else:
+                job.after_id = state['last_read']
+                job.done_ahead = []
+                finished_ahead.clear()
+
+        async def flush_prune():
+            batch = prune[:]
+            del prune[:]
+            if batch:
+                try:
+                    await del_users(batch)
+                except Exception as e:
+                    print(f"Could not prune {len(batch)} users: {e}")
+
+        async def checkpoint():
+            state['saved_at'] = job.done
+            advance_cursor()
+            await self.save(job)
+
+        async def producer():
+            try:
+                async for user_id in iter_userbase(after_id=job.after_id):
+                    if job.status != 'running':
+                        break
+                    state['last_read'] = user_id
+                    if user_id in skip:
+                        continue
+                    inflight[user_id] = True
+                    await queue.put(user_id)
+            finally:
+                for _ in range(self.workers):
+                    await queue.put(None)
+
+        async def worker():
+            while True:
+                user_id = await queue.get()
+                if user_id is None:
+                    return
+                should_prune = await self._send(client, job, user_id)
+                del inflight[user_id]
+                finished_ahead.add(user_id)
+                if should_prune:
+                    prune.append(user_id)
+                    if len(prune) >= PRUNE_BATCH:
+                        await flush_prune()
+                if job.done - state['saved_at'] >= self.checkpoint_every:
+                    await checkpoint()
+
+        async def reporter():
+            while True:
+                await asyncio.sleep(STATUS_INTERVAL)
+                await self.report(client, job)
+
+        status_task = asyncio.create_task(reporter())
+        try:
+            await asyncio.gather(producer(), *(worker() for _ in range(self.workers)))
+            if job.status == 'running':
+                job.status = 'finished'
+        finally:
+            # Also runs when the bot stops: the job stays 'running' and resumes from here
+            status_task.cancel()
+            await flush_prune()
+            advance_cursor()
+            job.elapsed = job.total_elapsed
+            job.run_started = None
+            await self.save(job)
+        print(f"📢 Broadcast {job.id} {job.status}: {job.sent}/{job.done} sent")
+        await self.report(client, job)
+
+
+broadcaster = BroadcastEngine()
+
+
+async def load_jobs():
+    jobs = await list_checkpoints(CHECKPOINT_PREFIX)
+    return sorted((BroadcastJob.from_dict(data) for data in jobs.values()), key=lambda job: job.created)
+
+
+async def resume_broadcasts(client: Client):
+    """Restart broadcasts that were running when the bot stopped"""
+    try:
+        jobs = await load_jobs()
+    except Exception as e:
+        print(f"⚠️ Could not read broadcast jobs: {e}")
+        return
+    for job in jobs:
+        if job.status == 'running':
+            print(f"📢 Resuming broadcast {job.id} after user {job.after_id}")
+            broadcaster.start(client, job)
+
+
+async def find_job(job_id: str):
+    if job_id in broadcaster.jobs:
+        return broadcaster.jobs[job_id]
+    data = await get_checkpoint(CHECKPOINT_PREFIX + job_id)
+    return BroadcastJob.from_dict(data) if data else None
+
+
+@Bot.on_message(filters.command('broadcast') & filters.private & filters.user([OWNER_ID] + ADMINS))
+async def broadcast(client: Bot, message: Message):
+    """
+    Broadcast message to all users
+    Usage: reply with /broadcast, or /broadcast [list|pause|resume|cancel] <job>
+    """
+
+    args = message.text.split()
+    action = args[1].lower() if len(args) > 1 else None
+
+    if action is None and message.reply_to_message:
+        status = await message.reply_text("📢 <b>Broadcasting...</b>\n\nPlease wait...", quote=True)
+        job = BroadcastJob(message.chat.id, message.reply_to_message.id, status.chat.id, status.id)
+        await broadcaster.save(job)
+        # Runs in the background so the handler does not hold an update worker for hours
+        broadcaster.start(client, job)
+        return
+
+    if action == 'list':
+        jobs = await load_jobs()
+        if not jobs:
+            await message.reply_text("📭 <b>No broadcasts yet.</b>", quote=True)
+            return
+        lines = ["📢 <b>Broadcast Jobs</b>\n"]
+        for job in jobs[-10:]:
+            job = broadcaster.jobs.get(job.id, job)
+            total = max(job.total, job.done, 1)
+            lines.append(
+                f"• <code>{job.id}</code> {STATUS_LABELS[job.status]} - "
+                f"<code>{job.done}/{total}</code> ({job.done * 100 // total}%)"
+            )
+        await message.reply_text("\n".join(lines), quote=True)
+        return
+
+    if action not in ['pause', 'resume', 'cancel'] or len(args) < 3:
+        await message.reply_text(
+            "📋 <b>Usage:</b>\n\n"
+            "• Reply to a message with <code>/broadcast</code> - Start a broadcast\n"
+            "• <code>/broadcast list</code> - Show recent broadcasts\n"
+            "• <code>/broadcast pause ID</code> - Pause a broadcast\n"
+            "• <code>/broadcast resume ID</code> - Resume a paused broadcast\n"
+            "• <code>/broadcast cancel ID</code> - Stop a broadcast for good",
+            quote=True
+        )
+        return
+
+    job = await find_job(args[2])
+    if job is None:
+        await message.reply_text(f"❌ <b>No broadcast</b> <code>{args[2]}</code>", quote=True)
+        return
+
+    if job.status == 'finished' or job.status == 'cancelled':
+        await message.reply_text(f"⚠️ <b>Broadcast already {job.status}.</b>", quote=True)
+        return
+
+    if action == 'resume':
+        if broadcaster.running(job.id):
+            await message.reply_text("⚠️ <b>Broadcast is already running.</b>", quote=True)
+            return
+        broadcaster.start(client, job)
+        await message.reply_text(f"▶️ <b>Broadcast</b> <code>{job.id}</code> <b>resumed.</b>", quote=True)
+        return
+
+    if action == 'pause' and job.status == 'paused':
+        await message.reply_text("⚠️ <b>Broadcast is already paused.</b>", quote=True)
+        return
+
+    await broadcaster.stop(job, 'paused' if action == 'pause' else 'cancelled')
+    await message.reply_text(job.status_text(), quote=True)
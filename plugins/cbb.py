@@ -3,7 +3,7 @@
 
 from pyrogram import __version__
 from bot import Bot
-from config import OWNER_ID, ADMINS, START_MSG, START_PIC
+from config import OWNER_ID, ADMINS, runtime
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
 
 @Bot.on_callback_query()
@@ -76,11 +76,13 @@ GNU General Public License v3.0
 • /batch - Create batch link for multiple files
 • /genlink - Create link for single file
 • /custom_batch - Custom range batch link
+• /bulklinks - Links for a whole range as CSV/JSON
 
 <b>📊 Bot Management:</b>
 • /users - View total user count
 • /broadcast - Broadcast message to all users
 • /stats - View bot statistics & uptime
+• /linkstats - Most clicked links & delivery volume
 
 <b>⚙️ Configuration:</b>
 • /setup - Open setup panel
@@ -157,7 +159,7 @@ Report issues or suggestions to admin
     
     elif data == "back_to_start":
         # Recreate start message
-        welcome_text = START_MSG.format(
+        welcome_text = runtime.start_msg.format(
             first=user.first_name,
             last=user.last_name if user.last_name else "",
             username=f"@{user.username}" if user.username else "None",
@@ -176,14 +178,15 @@ Report issues or suggestions to admin
         ])
         
         # If there's a start picture, try to recreate with photo
-        if START_PIC:
+        start_pic = runtime.start_pic
+        if start_pic:
             try:
                 # Delete current message
                 await query.message.delete()
                 # Send new photo message
                 await client.send_photo(
                     chat_id=query.message.chat.id,
-                    photo=START_PIC,
+                    photo=start_pic,
                     caption=welcome_text,
                     reply_markup=keyboard
                 )
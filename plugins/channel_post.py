@@ -6,10 +6,11 @@ from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
 from pyrogram.errors import FloodWait
 
 from bot import Bot
-from config import OWNER_ID, ADMINS, CHANNEL_ID, DISABLE_CHANNEL_BUTTON
-from helper_func import encode
+from config import OWNER_ID, ADMINS, CHANNEL_ID, runtime
+from helper_func import encode_link, message_cache, index_messages
+from database.database import delete_file_records
 
-@Bot.on_message(filters.private & filters.user([OWNER_ID] + ADMINS) & ~filters.command(['start','users','broadcast','batch','genlink','stats','setup','help','custom_batch','range_help']))
+@Bot.on_message(filters.private & filters.user([OWNER_ID] + ADMINS) & ~filters.command(['start','users','broadcast','batch','genlink','stats','setup','help','custom_batch','range_help','indexchannel','bulklinks','linkstats']))
 async def channel_post(client: Client, message: Message):
     """Handle private messages from admins to create shareable links"""
     
@@ -34,9 +35,9 @@ async def channel_post(client: Client, message: Message):
         await reply_text.edit_text("❌ Something went wrong! Make sure bot is admin in database channel.")
         return
     
-    converted_id = post_message.id * abs(client.db_channel.id)
-    string = f"get-{converted_id}"
-    base64_string = await encode(string)
+    await index_messages([post_message], client.db_channel.id)
+    
+    base64_string = encode_link(post_message.id)
     link = f"https://t.me/{client.username}?start={base64_string}"
     
     reply_markup = InlineKeyboardMarkup([
@@ -49,7 +50,7 @@ async def channel_post(client: Client, message: Message):
         disable_web_page_preview=True
     )
 
-    if not DISABLE_CHANNEL_BUTTON:
+    if not runtime.disable_channel_button:
         try:
             await post_message.edit_reply_markup(reply_markup)
         except FloodWait as e:
@@ -63,7 +64,10 @@ async def channel_post(client: Client, message: Message):
 async def new_post(client: Client, message: Message):
     """Automatically add share button to channel posts"""
     
-    if DISABLE_CHANNEL_BUTTON:
+    message_cache.invalidate(message.id)
+    await index_messages([message], message.chat.id)
+    
+    if runtime.disable_channel_button:
         return
     
     # Check if db_channel exists
@@ -72,9 +76,7 @@ async def new_post(client: Client, message: Message):
         return
 
     try:
-        converted_id = message.id * abs(client.db_channel.id)
-        string = f"get-{converted_id}"
-        base64_string = await encode(string)
+        base64_string = encode_link(message.id)
         link = f"https://t.me/{client.username}?start={base64_string}"
         
         reply_markup = InlineKeyboardMarkup([
@@ -88,3 +90,21 @@ async def new_post(client: Client, message: Message):
     except Exception as e:
         print(f"Error in new_post: {e}")
         pass
+
+
+@Bot.on_edited_message(filters.channel & filters.chat(CHANNEL_ID))
+async def edited_post(client: Client, message: Message):
+    """Refresh cache and file index so links serve the edited version"""
+    message_cache.invalidate(message.id)
+    await index_messages([message], message.chat.id)
+
+
+@Bot.on_deleted_messages(filters.chat(CHANNEL_ID))
+async def deleted_posts(client: Client, messages):
+    """Drop deleted posts from the message cache and file index"""
+    msg_ids = [msg.id for msg in messages]
+    message_cache.invalidate(*msg_ids)
+    try:
+        await delete_file_records(msg_ids)
+    except Exception as e:
+        print(f"Error removing deleted posts from file index: {e}")
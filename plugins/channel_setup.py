@@ -5,7 +5,8 @@ from pyrogram import Client, filters
 from pyrogram.types import Message
 from bot import Bot
 from config import OWNER_ID, ADMINS
-from database.database import update_setting
+from database.database import get_setting_async, update_setting_async
+from helper_func import message_cache
 import asyncio
 
 @Bot.on_message(filters.command('setchannel') & filters.private & filters.user([OWNER_ID] + ADMINS))
@@ -117,7 +118,7 @@ async def set_channel_command(client: Bot, message: Message):
             else:
                 # For force sub, just check if we can create invite link
                 try:
-                    link = await client.export_chat_invite_link(channel_id)
+                    await client.export_chat_invite_link(channel_id)
                     permissions_ok = True
                 except Exception as e:
                     permissions_ok = False
@@ -125,17 +126,14 @@ async def set_channel_command(client: Bot, message: Message):
             
             # Save to database
             if is_db:
-                update_setting('channel_id', str(channel_id))
+                await update_setting_async('channel_id', str(channel_id))
                 # Also update the client's db_channel
                 client.db_channel = chat
+                message_cache.clear()
             else:
-                update_setting('force_channel', str(channel_id))
-                # Update invite link
-                try:
-                    link = await client.export_chat_invite_link(channel_id)
-                    client.invitelink = link
-                except:
-                    pass
+                await update_setting_async('force_channel', str(channel_id))
+                # Rebuild the invite links for the new channel list
+                await client.setup_force_sub()
             
             # Success message
             success_text = f"""
@@ -205,10 +203,8 @@ async def set_channel_command(client: Bot, message: Message):
 async def view_channels(client: Bot, message: Message):
     """View currently configured channels"""
     
-    from database.database import get_setting
-    
-    db_channel = get_setting('channel_id', 'Not Set')
-    force_channel = get_setting('force_channel', '0')
+    db_channel = await get_setting_async('channel_id', 'Not Set')
+    force_channel = await get_setting_async('force_channel', '0')
     
     # Try to get channel names
     db_name = "Not Set"
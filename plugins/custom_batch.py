@@ -1,11 +1,12 @@
 #(©)Codexbotz
 # plugins/custom_batch.py
 
+import re
 from pyrogram import Client, filters
 from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
 from bot import Bot
-from config import OWNER_ID, ADMINS
-from helper_func import encode, shorten_url
+from config import OWNER_ID, ADMINS, BATCH_MAX_IDS
+from helper_func import batch_parameter, create_batch, shorten_url, get_readable_time
 
 @Bot.on_message(filters.private & filters.user([OWNER_ID] + ADMINS) & filters.command('custom_batch'))
 async def custom_batch(client: Client, message: Message):
@@ -39,10 +40,15 @@ Specific message IDs only
 <code>123-130, 145, 150-155</code>
 Combines ranges and individual IDs
 
+<b>⚙️ Options (one per line after the IDs):</b>
+<code>caption: Season 1</code> - Caption for every file
+<code>protect: yes</code> - Block forwarding for this link
+<code>expire: 7d</code> - Link stops working after 30m / 12h / 7d
+
 <b>⚠️ Important Notes:</b>
 • Use commas to separate ranges/IDs
 • No spaces in range (123-130 not 123 - 130)
-• Maximum 200 messages per link
+• Maximum {max_ids} messages per link
 • All IDs must be from DB channel
 
 <b>💡 Examples:</b>
@@ -54,7 +60,7 @@ Combines ranges and individual IDs
 <i>Type <code>cancel</code> to abort</i>
 """
     
-    msg = await message.reply_text(help_msg, quote=True)
+    msg = await message.reply_text(help_msg.format(max_ids=BATCH_MAX_IDS), quote=True)
     
     try:
         # Wait for user response
@@ -64,9 +70,11 @@ Combines ranges and individual IDs
             await msg.edit_text("❌ <b>Cancelled!</b>")
             return
         
-        # Parse the input
+        # Parse the input: IDs on the first line, options below
+        lines = response.text.strip().split('\n')
         try:
-            message_ids = parse_custom_range(response.text)
+            message_ids = parse_custom_range(lines[0])
+            options = parse_batch_options(lines[1:])
         except ValueError as e:
             await response.reply_text(
                 f"❌ <b>Invalid Format!</b>\n\n{str(e)}\n\nPlease try again with <code>/custom_batch</code>",
@@ -75,11 +83,11 @@ Combines ranges and individual IDs
             return
         
         # Validate message count
-        if len(message_ids) > 200:
+        if len(message_ids) > BATCH_MAX_IDS:
             await response.reply_text(
                 f"❌ <b>Too many messages!</b>\n\n"
                 f"You requested <b>{len(message_ids)}</b> messages.\n"
-                f"Maximum allowed: <b>200</b> messages per link.\n\n"
+                f"Maximum allowed: <b>{BATCH_MAX_IDS}</b> messages per link.\n\n"
                 f"Please reduce the range and try again.",
                 quote=True
             )
@@ -100,13 +108,12 @@ Combines ranges and individual IDs
             quote=True
         )
         
-        # Convert IDs to database channel format
-        first_id = min(message_ids) * abs(client.db_channel.id)
-        last_id = max(message_ids) * abs(client.db_channel.id)
-        
-        # Create batch string
-        string = f"get-{first_id}-{last_id}"
-        base64_string = await encode(string)
+        # Encode exactly the requested ids, gaps between ranges are not delivered.
+        # Options only exist on stored batches, so those always get a token link.
+        if options:
+            base64_string = await create_batch(message_ids, **options)
+        else:
+            base64_string = await batch_parameter(message_ids)
         
         # Generate link
         link = f"https://t.me/{client.username}?start={base64_string}"
@@ -122,18 +129,21 @@ Combines ranges and individual IDs
 ├ <b>Total Messages:</b> <code>{len(message_ids)}</code>
 ├ <b>Start ID:</b> <code>{min(message_ids)}</code>
 ├ <b>End ID:</b> <code>{max(message_ids)}</code>
-└ <b>Range:</b> <code>{response.text}</code>
-
+└ <b>Range:</b> <code>{lines[0]}</code>
+{format_batch_options(options)}
 <b>🔗 Your Batch Link:</b>
 <code>{shortened_link if shortened_link != link else link}</code>
 
 <b>💡 Share this link to give access to all {len(message_ids)} files!</b>
 """
         
-        reply_markup = InlineKeyboardMarkup([
-            [InlineKeyboardButton("🔁 Share Link", url=f'https://telegram.me/share/url?url={shortened_link}')],
-            [InlineKeyboardButton("📋 Copy Link", callback_data=f"copy_{base64_string}")]
-        ])
+        buttons = [
+            [InlineKeyboardButton("🔁 Share Link", url=f'https://telegram.me/share/url?url={shortened_link}')]
+        ]
+        # Callback data is limited to 64 bytes
+        if len(f"copy_{base64_string}") <= 64:
+            buttons.append([InlineKeyboardButton("📋 Copy Link", callback_data=f"copy_{base64_string}")])
+        reply_markup = InlineKeyboardMarkup(buttons)
         
         await processing.edit_text(
             link_text,
@@ -188,6 +198,64 @@ def parse_custom_range(text: str) -> list:
     
     return message_ids
 
+DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_batch_options(lines: list) -> dict:
+    """
+    Parse optional "key: value" lines into create_batch() arguments
+    Supports: caption: text, protect: yes/no, expire: 30m / 12h / 7d
+    """
+    options = {}
+    
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        key, sep, value = line.partition(':')
+        key = key.strip().lower()
+        value = value.strip()
+        if not sep or not value:
+            raise ValueError(f"Invalid option: {line}")
+        
+        if key == 'caption':
+            try:
+                value.format(previouscaption="", filename="")
+            except (KeyError, IndexError, AttributeError, ValueError) as e:
+                raise ValueError(f"Invalid caption: {e} (placeholders are {{previouscaption}} and {{filename}})")
+            options['caption'] = value
+        elif key == 'protect':
+            if value.lower() in ['yes', 'on', 'true']:
+                options['protect'] = True
+            elif value.lower() in ['no', 'off', 'false']:
+                options['protect'] = False
+            else:
+                raise ValueError(f"Invalid protect value: {value} (use yes or no)")
+        elif key in ['expire', 'expires']:
+            match = re.fullmatch(r'(\d+)\s*([smhd]?)', value.lower())
+            if not match or int(match.group(1)) == 0:
+                raise ValueError(f"Invalid expiry: {value} (use e.g. 30m, 12h, 7d)")
+            options['expires_in'] = int(match.group(1)) * DURATION_UNITS[match.group(2) or 's']
+        else:
+            raise ValueError(f"Unknown option: {key}")
+    
+    return options
+
+
+def format_batch_options(options: dict) -> str:
+    """Summary of the options stored with a batch, empty when there are none"""
+    if not options:
+        return ""
+    text = "\n<b>⚙️ Options:</b>\n"
+    if options.get('caption'):
+        text += f"• <b>Caption:</b> <code>{options['caption']}</code>\n"
+    if options.get('protect') is not None:
+        text += f"• <b>Protect:</b> <code>{'Yes' if options['protect'] else 'No'}</code>\n"
+    if options.get('expires_in'):
+        text += f"• <b>Expires In:</b> <code>{get_readable_time(options['expires_in'])}</code>\n"
+    return text
+
+
 @Bot.on_callback_query(filters.regex(r'^copy_'))
 async def copy_link_callback(client: Bot, query):
     """Handle copy link callback"""
@@ -270,9 +338,9 @@ async def range_help(client: Client, message: Message):
    Season 2: <code>1011-1020</code>
    Separate links per season
 
-<b>📊 Limit:</b> Maximum 200 messages per link
+<b>📊 Limit:</b> Maximum {max_ids} messages per link
 
 <b>Ready to create? Use:</b> <code>/custom_batch</code>
 """
     
-    await message.reply_text(examples, quote=True)
+    await message.reply_text(examples.format(max_ids=BATCH_MAX_IDS), quote=True)
@@ -1,11 +1,12 @@
 # plugins/diagnose_link.py
 # Diagnostic tool to find link issues
 
+import base64
 from pyrogram import Client, filters
 from pyrogram.types import Message
 from bot import Bot
 from config import OWNER_ID, ADMINS
-from helper_func import decode, encode
+from helper_func import decode_link, encode_link
 
 @Bot.on_message(filters.command('diagnose') & filters.private & filters.user([OWNER_ID] + ADMINS))
 async def diagnose_link(client: Bot, message: Message):
@@ -31,18 +32,24 @@ async def diagnose_link(client: Bot, message: Message):
     # Test 2: Check encoding/decoding
     results.append("<b>2️⃣ Encode/Decode Test:</b>")
     try:
-        test_string = "get-1234567890"
-        encoded = await encode(test_string)
-        decoded = await decode(encoded)
+        test_ids = [1234567890]
+        encoded = encode_link(test_ids[0])
+        decoded = list(decode_link(encoded, -1001234567890).message_ids)
         
-        if test_string == decoded:
-            results.append(f"✅ Encoding works: {encoded[:20]}...")
-            results.append(f"✅ Decoding works: {decoded}\n")
+        # Links from before the binary format must keep working
+        legacy = base64.urlsafe_b64encode(f"get-{1234 * 1001234567890}".encode()).decode().strip("=")
+        legacy_decoded = list(decode_link(legacy, -1001234567890).message_ids)
+        
+        if decoded == test_ids and legacy_decoded == [1234]:
+            results.append(f"✅ Encoding works: {encoded}")
+            results.append(f"✅ Decoding works: {decoded}")
+            results.append(f"✅ Legacy links work: {legacy_decoded}\n")
             encode_ok = True
         else:
             results.append(f"❌ Decode mismatch!")
-            results.append(f"   Original: {test_string}")
-            results.append(f"   Decoded: {decoded}\n")
+            results.append(f"   Original: {test_ids}")
+            results.append(f"   Decoded: {decoded}")
+            results.append(f"   Legacy: {legacy_decoded}\n")
             encode_ok = False
     except Exception as e:
         results.append(f"❌ Encode/Decode error: {e}\n")
@@ -53,14 +60,11 @@ async def diagnose_link(client: Bot, message: Message):
     if db_ok:
         try:
             test_msg_id = 1
-            converted_id = test_msg_id * abs(client.db_channel.id)
-            link_string = f"get-{converted_id}"
-            encoded_link = await encode(link_string)
+            encoded_link = encode_link(test_msg_id)
             full_link = f"https://t.me/{client.username}?start={encoded_link}"
             
             results.append(f"✅ Test Message ID: {test_msg_id}")
-            results.append(f"✅ Converted: {converted_id}")
-            results.append(f"✅ Encoded: {encoded_link[:30]}...")
+            results.append(f"✅ Encoded: {encoded_link}")
             results.append(f"✅ Link: {full_link[:50]}...\n")
             link_ok = True
         except Exception as e:
@@ -95,23 +99,16 @@ async def diagnose_link(client: Bot, message: Message):
             simulated_text = f"/start {test_param}"
             
             # Try to decode it
-            decoded_param = await decode(test_param)
-            parts = decoded_param.split("-")
+            decoded_link = decode_link(test_param, client.db_channel.id)
             
             results.append(f"✅ Simulated: /start {test_param[:20]}...")
-            results.append(f"✅ Decoded: {decoded_param}")
-            results.append(f"✅ Parts: {len(parts)} parts")
+            results.append(f"✅ Decoded: {list(decoded_link.message_ids)}")
             
-            if len(parts) == 2:
-                try:
-                    msg_id = int(int(parts[1]) / abs(client.db_channel.id))
-                    results.append(f"✅ Calculated Message ID: {msg_id}\n")
-                    process_ok = True
-                except Exception as e:
-                    results.append(f"❌ ID calculation error: {e}\n")
-                    process_ok = False
+            if list(decoded_link.message_ids) == [test_msg_id]:
+                results.append(f"✅ Calculated Message ID: {test_msg_id}\n")
+                process_ok = True
             else:
-                results.append(f"❌ Invalid format (expected 2 parts)\n")
+                results.append(f"❌ Expected message {test_msg_id}\n")
                 process_ok = False
         except Exception as e:
             results.append(f"❌ Processing error: {e}\n")
@@ -173,9 +170,7 @@ async def test_file_link(client: Bot, message: Message):
         msg_id = response.forward_from_message_id
         
         # Generate link
-        converted_id = msg_id * abs(client.db_channel.id)
-        link_string = f"get-{converted_id}"
-        encoded = await encode(link_string)
+        encoded = encode_link(msg_id)
         link = f"https://t.me/{client.username}?start={encoded}"
         
         result = f"""
@@ -184,8 +179,7 @@ async def test_file_link(client: Bot, message: Message):
 <b>📋 Details:</b>
 • Message ID: <code>{msg_id}</code>
 • Channel ID: <code>{client.db_channel.id}</code>
-• Converted: <code>{converted_id}</code>
-• Encoded: <code>{encoded[:30]}...</code>
+• Encoded: <code>{encoded}</code>
 
 <b>🔗 Test Link:</b>
 {link}
@@ -196,9 +190,8 @@ async def test_file_link(client: Bot, message: Message):
 3. If it shows welcome instead, there's a handler issue
 
 <b>📊 What Should Happen:</b>
-• Link parameter: <code>{encoded[:20]}...</code>
-• Decode to: <code>{link_string}</code>
-• Calculate: <code>{converted_id} / {abs(client.db_channel.id)} = {msg_id}</code>
+• Link parameter: <code>{encoded}</code>
+• Decode to: message <code>{msg_id}</code>
 • Fetch message {msg_id} from channel
 • Send to you
 
@@ -230,17 +223,17 @@ async def check_start_handler(client: Bot, message: Message):
         else:
             checks.append("❌ Missing parameter detection")
         
-        # Check 2: Has base64 decode
-        if "decode(base64_string)" in content or "await decode" in content:
+        # Check 2: Has link decode
+        if "decode_link(" in content:
             checks.append("✅ Has decode function")
         else:
             checks.append("❌ Missing decode function")
         
-        # Check 3: Has get_messages
-        if "get_messages" in content:
-            checks.append("✅ Has get_messages call")
+        # Check 3: Streams files through the delivery engine
+        if "iter_delivery_items(" in content and "delivery_engine.deliver(" in content:
+            checks.append("✅ Has file delivery")
         else:
-            checks.append("❌ Missing get_messages call")
+            checks.append("❌ Missing file delivery")
         
         # Check 4: Two start handlers
         start_count = content.count("@Bot.on_message(filters.command('start')")
@@ -0,0 +1,300 @@
+# plugins/file_index.py
+# Background backfill of the file index for posts that predate it
+
+import time
+import asyncio
+from pyrogram import Client, filters
+from pyrogram.types import Message
+
+from bot import Bot
+from config import OWNER_ID, ADMINS, INDEX_CONCURRENCY, INDEX_BATCH_PAUSE
+from helper_func import fetch_messages, build_file_record, get_link_message_id, FETCH_CHUNK_SIZE
+from database.database import save_file_records, get_checkpoint, save_checkpoint
+
+CHECKPOINT_NAME = 'file_index'
+REPORT_INTERVAL = 15
+# Empty windows in a row before the newest-post search treats ids as unused,
+# so runs of deleted or service posts shorter than this many windows are skipped
+EMPTY_WINDOWS = 5
+
+
+class ChannelIndexer:
+    """Walks the DB channel by message id and upserts delivery records in batches"""
+
+    def __init__(self):
+        self.task = None
+        self.state = None
+        self.run_started = None
+        self.run_rows = 0
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    @property
+    def rate(self) -> float:
+        """Rows indexed per second during the current run"""
+        if not self.run_started:
+            return 0.0
+        elapsed = time.monotonic() - self.run_started
+        return self.run_rows / elapsed if elapsed > 0 else 0.0
+
+    def status_text(self) -> str:
+        state = self.state
+        if not state:
+            return "📭 <b>No index run recorded.</b>"
+        total = max(1, state['last_id'] - state['first_id'] + 1)
+        done = min(total, state['next_id'] - state['first_id'])
+        if self.running:
+            status = "⏳ Running"
+        elif state.get('finished'):
+            status = "✅ Finished"
+        elif state.get('error'):
+            status = f"❌ Failed: <code>{state['error']}</code>"
+        else:
+            status = "⏸️ Stopped"
+        return (
+            f"🗂️ <b>Channel Index</b>\n\n"
+            f"<b>Status:</b> {status}\n"
+            f"<b>Progress:</b> <code>{done}/{total}</code> ({done * 100 // total}%)\n"
+            f"<b>Indexed:</b> <code>{state['indexed']}</code>\n"
+            f"<b>Skipped:</b> <code>{state['skipped']}</code>\n"
+            f"<b>Speed:</b> <code>{self.rate:.1f}</code> rows/s"
+        )
+
+    async def report(self, client: Client):
+        state = self.state
+        if not state.get('status_chat'):
+            return
+        try:
+            await client.edit_message_text(state['status_chat'], state['status_msg'], self.status_text())
+        except Exception:
+            pass
+
+    def start(self, client: Client, state: dict):
+        self.state = state
+        self.state['running'] = True
+        self.state.pop('error', None)
+        self.run_started = time.monotonic()
+        self.run_rows = 0
+        self.task = asyncio.create_task(self._run(client))
+
+    async def stop(self):
+        if self.running:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        if self.state:
+            self.state['running'] = False
+            await save_checkpoint(CHECKPOINT_NAME, self.state)
+
+    async def _run(self, client: Client):
+        state = self.state
+        batch_size = FETCH_CHUNK_SIZE * INDEX_CONCURRENCY
+        # Its own slots, so a full scan neither waits behind nor starves /start fetches
+        semaphore = asyncio.Semaphore(max(1, INDEX_CONCURRENCY))
+        last_report = time.monotonic()
+        try:
+            while state['next_id'] <= state['last_id']:
+                end_id = min(state['next_id'] + batch_size, state['last_id'] + 1)
+                message_ids = list(range(state['next_id'], end_id))
+
+                # Bypass the message cache so a full scan does not evict hot /start entries
+                failed = []
+                messages, _ = await fetch_messages(
+                    client, message_ids, semaphore=semaphore, use_cache=False, failed=failed
+                )
+                if failed:
+                    # Keep what came before the failed chunk, the checkpoint must not pass it
+                    end_id = failed[0]
+                    messages = [msg for msg in messages if msg.id < end_id]
+                records = [r for r in (build_file_record(msg, state['chat_id']) for msg in messages) if r]
+                await save_file_records(records)
+
+                state['indexed'] += len(records)
+                state['skipped'] += end_id - state['next_id'] - len(records)
+                state['next_id'] = end_id
+                self.run_rows += len(records)
+                await save_checkpoint(CHECKPOINT_NAME, state)
+
+                if failed:
+                    raise RuntimeError(f"messages {failed[0]}..{failed[-1]} could not be fetched")
+
+                if time.monotonic() - last_report >= REPORT_INTERVAL:
+                    last_report = time.monotonic()
+                    await self.report(client)
+
+                # Leave room for /start traffic between batches
+                await asyncio.sleep(INDEX_BATCH_PAUSE)
+
+            state['running'] = False
+            state['finished'] = True
+            await save_checkpoint(CHECKPOINT_NAME, state)
+            print(f"✅ Channel index finished: {state['indexed']} rows ({self.rate:.1f} rows/s)")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"❌ Channel index failed at {state['next_id']}: {e}")
+            state['running'] = False
+            state['error'] = str(e)
+            try:
+                await save_checkpoint(CHECKPOINT_NAME, state)
+            except Exception:
+                pass
+        await self.report(client)
+
+
+indexer = ChannelIndexer()
+
+
+async def newest_in_window(client: Client, first_id: int) -> int:
+    """Newest existing post among the FETCH_CHUNK_SIZE ids from first_id, 0 if none"""
+    msgs = await client.get_messages(
+        client.db_channel.id, list(range(first_id, first_id + FETCH_CHUNK_SIZE))
+    )
+    return max((msg.id for msg in msgs if msg and not msg.empty), default=0)
+
+
+async def has_posts_from(client: Client, first_id: int) -> bool:
+    """Whether any of the EMPTY_WINDOWS windows from first_id holds a post"""
+    for i in range(EMPTY_WINDOWS):
+        if await newest_in_window(client, first_id + i * FETCH_CHUNK_SIZE):
+            return True
+    return False
+
+
+async def get_last_message_id(client: Client) -> int:
+    """
+    Bots cannot read channel history, so find the newest id with get_messages:
+    double the start until EMPTY_WINDOWS windows in a row come back empty,
+    bisect, then scan forward from there. Posting a probe instead would
+    fire the channel post handlers.
+    """
+    low = 1
+    step = FETCH_CHUNK_SIZE
+    while await has_posts_from(client, low + step):
+        low += step
+        step *= 2
+    high = low + step
+
+    # Nothing is stored in the EMPTY_WINDOWS windows from high
+    while high - low > FETCH_CHUNK_SIZE:
+        middle = (low + high) // 2
+        if await has_posts_from(client, middle):
+            low = middle
+        else:
+            high = middle
+
+    newest = 0
+    empty = 0
+    while empty < EMPTY_WINDOWS:
+        found = await newest_in_window(client, low)
+        if found:
+            newest, empty = found, 0
+        else:
+            empty += 1
+        low += FETCH_CHUNK_SIZE
+    return newest
+
+
+async def resume_indexer(client: Client):
+    """Resume an index run that was interrupted by a restart"""
+    try:
+        state = await get_checkpoint(CHECKPOINT_NAME)
+    except Exception as e:
+        print(f"⚠️ Could not read index checkpoint: {e}")
+        return
+    if not state or not state.get('running'):
+        return
+    if state['chat_id'] != client.db_channel.id:
+        print("⚠️ Index checkpoint belongs to another DB channel, not resuming")
+        return
+    print(f"🗂️ Resuming channel index from message {state['next_id']}")
+    indexer.start(client, state)
+
+
+@Bot.on_message(filters.command('indexchannel') & filters.private & filters.user([OWNER_ID] + ADMINS))
+async def index_channel(client: Bot, message: Message):
+    """
+    Backfill the file index from the DB channel
+    Usage: /indexchannel [status|stop|restart] [last_id|post_link]
+    """
+    args = message.text.split()[1:]
+    action = 'start'
+    if args and not args[0].isdigit() and not args[0].startswith('https://'):
+        action = args.pop(0).lower()
+    last_arg = args.pop(0) if args else None
+
+    if action == 'status':
+        if indexer.state is None:
+            indexer.state = await get_checkpoint(CHECKPOINT_NAME)
+        await message.reply_text(indexer.status_text(), quote=True)
+        return
+
+    if action == 'stop':
+        if not indexer.running:
+            await message.reply_text("⚠️ <b>Indexer is not running.</b>", quote=True)
+            return
+        await indexer.stop()
+        await message.reply_text(
+            "⏸️ <b>Indexer stopped.</b>\n\nRun <code>/indexchannel</code> to resume.",
+            quote=True
+        )
+        return
+
+    if action not in ['start', 'restart'] or args:
+        await message.reply_text(
+            "📋 <b>Usage:</b>\n\n"
+            "• <code>/indexchannel</code> - Start or resume indexing\n"
+            "• <code>/indexchannel status</code> - Show progress\n"
+            "• <code>/indexchannel stop</code> - Pause indexing\n"
+            "• <code>/indexchannel restart</code> - Index from the first post again\n"
+            "• <code>/indexchannel 5000</code> - Index up to post 5000 (an id or post link)",
+            quote=True
+        )
+        return
+
+    if not hasattr(client, 'db_channel') or client.db_channel is None:
+        await message.reply_text("❌ <b>Database Channel Not Configured!</b>", quote=True)
+        return
+
+    if indexer.running:
+        await message.reply_text(indexer.status_text(), quote=True)
+        return
+
+    status = await message.reply_text("🔍 <b>Preparing channel index...</b>", quote=True)
+
+    state = None if action == 'restart' else await get_checkpoint(CHECKPOINT_NAME)
+    if state and (state.get('finished') or state['chat_id'] != client.db_channel.id):
+        state = None
+
+    try:
+        if last_arg is None:
+            last_id = await get_last_message_id(client)
+        elif last_arg.isdigit():
+            last_id = int(last_arg)
+        else:
+            last_id = get_link_message_id(client, last_arg.rstrip('/'))
+            if not last_id:
+                await status.edit_text("❌ <b>That is not a post link from the DB channel.</b>")
+                return
+    except Exception as e:
+        await status.edit_text(f"❌ <b>Cannot read the DB channel:</b> <code>{e}</code>")
+        return
+
+    if state is None:
+        state = {
+            'chat_id': client.db_channel.id,
+            'first_id': 1,
+            'next_id': 1,
+            'indexed': 0,
+            'skipped': 0,
+        }
+    state['last_id'] = last_id
+    state['status_chat'] = status.chat.id
+    state['status_msg'] = status.id
+
+    indexer.start(client, state)
+    await status.edit_text(indexer.status_text())
@@ -0,0 +1,29 @@
+# plugins/force_sub.py
+# Keep the force-sub membership cache in step with the channels
+
+from pyrogram import Client
+from pyrogram.types import ChatMemberUpdated, ChatJoinRequest
+
+from bot import Bot
+from config import runtime
+from helper_func import membership_cache, MEMBER_STATUSES
+
+
+@Bot.on_chat_member_updated()
+async def member_updated(client: Client, update: ChatMemberUpdated):
+    """Record joins and leaves in the force-sub channels as they happen"""
+    if update.chat.id not in runtime.force_sub_channels:
+        return
+    member = update.new_chat_member or update.old_chat_member
+    if member is None or member.user is None:
+        return
+    joined = update.new_chat_member is not None and update.new_chat_member.status in MEMBER_STATUSES
+    membership_cache.put(update.chat.id, member.user.id, joined)
+
+
+@Bot.on_chat_join_request()
+async def join_requested(client: Client, request: ChatJoinRequest):
+    """Drop a cached "not joined" so the next click checks again instead of waiting out the TTL"""
+    if request.chat.id not in runtime.force_sub_channels:
+        return
+    membership_cache.invalidate(request.chat.id, request.from_user.id)
@@ -1,10 +1,14 @@
 # plugins/link_generator.py - Fixed version
 
+import io
+import csv
+import json
 from pyrogram import Client, filters
 from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
 from bot import Bot
-from config import OWNER_ID, ADMINS
-from helper_func import encode, get_message_id
+from config import OWNER_ID, ADMINS, BATCH_MAX_IDS
+from helper_func import encode_link, get_message_id, get_link_message_id
+from database.database import get_file_records
 
 @Bot.on_message(filters.private & filters.user([OWNER_ID] + ADMINS) & filters.command('batch'))
 async def batch(client: Client, message: Message):
@@ -61,13 +65,21 @@ async def batch(client: Client, message: Message):
             )
             continue
 
-    string = f"get-{f_msg_id * abs(client.db_channel.id)}-{s_msg_id * abs(client.db_channel.id)}"
-    base64_string = await encode(string)
-    link = f"https://t.me/{client.username}?start={base64_string}"
-    
     # Calculate message count
     msg_count = abs(s_msg_id - f_msg_id) + 1
     
+    if msg_count > BATCH_MAX_IDS:
+        await second_message.reply_text(
+            f"❌ <b>Too many messages!</b>\n\n"
+            f"This range has <b>{msg_count}</b> messages.\n"
+            f"Maximum allowed: <b>{BATCH_MAX_IDS}</b> messages per link.",
+            quote=True
+        )
+        return
+    
+    base64_string = encode_link(f_msg_id, s_msg_id)
+    link = f"https://t.me/{client.username}?start={base64_string}"
+    
     reply_text = f"""
 ✅ <b>Batch Link Generated!</b>
 
@@ -128,7 +140,7 @@ async def link_generator(client: Client, message: Message):
             )
             continue
 
-    base64_string = await encode(f"get-{msg_id * abs(client.db_channel.id)}")
+    base64_string = encode_link(msg_id)
     link = f"https://t.me/{client.username}?start={base64_string}"
     
     reply_text = f"""
@@ -153,3 +165,122 @@ async def link_generator(client: Client, message: Message):
         reply_markup=reply_markup,
         disable_web_page_preview=True
     )
+
+
+# Upper bound on posts one /bulklinks run covers
+BULK_MAX_RANGE = 100000
+# File names are looked up from the index this many ids at a time
+BULK_LOOKUP_CHUNK = 1000
+
+
+def parse_post_id(client: Client, text: str) -> int:
+    """Message id from a plain number or a DB channel post link, ValueError for anything else"""
+    if text.isdigit():
+        return int(text)
+    msg_id = get_link_message_id(client, text.rstrip('/'))
+    if not msg_id:
+        raise ValueError(f"not a DB channel post: {text}")
+    return msg_id
+
+
+def build_bulk_rows(first_id: int, last_id: int, group_size: int, username: str) -> list:
+    """One row per link, computed locally: no API call per message"""
+    rows = []
+    for start_id in range(first_id, last_id + 1, group_size):
+        end_id = min(start_id + group_size - 1, last_id)
+        rows.append({
+            'first_id': start_id,
+            'last_id': end_id,
+            'messages': end_id - start_id + 1,
+            'link': f"https://t.me/{username}?start={encode_link(start_id, end_id)}",
+            'file_name': "",
+        })
+    return rows
+
+
+async def add_file_names(rows: list):
+    """Label single-post links with the indexed file name, if the post is indexed"""
+    singles = {row['first_id']: row for row in rows if row['messages'] == 1}
+    ids = list(singles)
+    for i in range(0, len(ids), BULK_LOOKUP_CHUNK):
+        records = await get_file_records(ids[i:i + BULK_LOOKUP_CHUNK])
+        for msg_id, record in records.items():
+            singles[int(msg_id)]['file_name'] = record.get('file_name') or ""
+
+
+@Bot.on_message(filters.private & filters.user([OWNER_ID] + ADMINS) & filters.command('bulklinks'))
+async def bulk_links(client: Client, message: Message):
+    """
+    Generate links for a whole range of DB channel posts in one go
+    Usage: /bulklinks <first_id> <last_id> [group_size] [csv|json]
+    """
+    usage = (
+        "📋 <b>Usage:</b>\n\n"
+        "<code>/bulklinks first_id last_id [group_size] [csv|json]</code>\n\n"
+        "• <code>/bulklinks 100 3100</code> - One link per post\n"
+        "• <code>/bulklinks 100 3100 10</code> - One link per 10 posts\n"
+        "• <code>/bulklinks 100 3100 1 json</code> - JSON instead of CSV\n\n"
+        "Post links from the DB channel work in place of ids."
+    )
+    
+    if not hasattr(client, 'db_channel') or client.db_channel is None:
+        await message.reply_text("❌ <b>Database Channel Not Configured!</b>", quote=True)
+        return
+    
+    args = message.text.split()[1:]
+    output = 'csv'
+    if args and args[-1].lower() in ['csv', 'json']:
+        output = args.pop().lower()
+    
+    try:
+        if len(args) not in [2, 3]:
+            raise ValueError
+        first_id, last_id = sorted([parse_post_id(client, args[0]), parse_post_id(client, args[1])])
+        group_size = int(args[2]) if len(args) == 3 else 1
+        if first_id <= 0 or group_size <= 0:
+            raise ValueError
+    except ValueError:
+        await message.reply_text(usage, quote=True)
+        return
+    
+    total = last_id - first_id + 1
+    if total > BULK_MAX_RANGE or group_size > BATCH_MAX_IDS:
+        await message.reply_text(
+            f"❌ <b>Range too large!</b>\n\n"
+            f"Maximum <b>{BULK_MAX_RANGE}</b> posts per run and <b>{BATCH_MAX_IDS}</b> posts per link.",
+            quote=True
+        )
+        return
+    
+    status = await message.reply_text(f"⏳ <b>Generating links for {total} posts...</b>", quote=True)
+    
+    rows = build_bulk_rows(first_id, last_id, group_size, client.username)
+    try:
+        await add_file_names(rows)
+    except Exception as e:
+        # Names are a convenience, the links are still valid
+        print(f"Bulk links: file name lookup failed: {e}")
+    
+    if output == 'json':
+        document = io.BytesIO(json.dumps(rows, indent=2, ensure_ascii=False).encode('utf-8'))
+    else:
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=['first_id', 'last_id', 'messages', 'link', 'file_name'])
+        writer.writeheader()
+        writer.writerows(rows)
+        document = io.BytesIO(buffer.getvalue().encode('utf-8'))
+    document.name = f"links_{first_id}-{last_id}.{output}"
+    
+    await message.reply_document(
+        document,
+        caption=(
+            f"✅ <b>{len(rows)} links generated</b>\n\n"
+            f"<b>Posts:</b> <code>{first_id}</code> - <code>{last_id}</code> ({total})\n"
+            f"<b>Posts per link:</b> <code>{group_size}</code>"
+        ),
+        quote=True
+    )
+    try:
+        await status.delete()
+    except Exception:
+        pass
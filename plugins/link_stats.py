@@ -0,0 +1,103 @@
+# plugins/link_stats.py
+# Hot links and delivery volume from the buffered click counters
+
+import time
+from pyrogram import filters
+from pyrogram.types import Message
+
+from bot import Bot
+from config import OWNER_ID, ADMINS
+from helper_func import decode_link
+from database.database import link_stats, top_counters, counter_totals
+
+WINDOWS = {'1h': 3600, '24h': 86400, '7d': 7 * 86400, '30d': 30 * 86400, 'all': None}
+DEFAULT_WINDOW = '24h'
+DEFAULT_TOP = 10
+# Keeps the reply under Telegram's 4096 character limit
+MAX_TOP = 25
+
+
+def window_start(window: str) -> int:
+    """First hourly bucket of `window`, so windows are rounded out to whole hours"""
+    seconds = WINDOWS[window]
+    if seconds is None:
+        return 0
+    return (int(time.time()) - seconds) // link_stats.BUCKET * link_stats.BUCKET
+
+
+def describe_link(client: Bot, parameter: str) -> str:
+    """What a /start parameter points at, for admins who only see the token"""
+    channel_id = client.db_channel.id if getattr(client, 'db_channel', None) else 1
+    try:
+        link = decode_link(parameter, channel_id)
+    except Exception:
+        return "invalid link"
+    if link.batch_token:
+        return "stored batch"
+    message_ids = link.message_ids
+    if len(message_ids) == 1:
+        return f"message {message_ids[0]}"
+    if isinstance(message_ids, range):
+        return f"messages {message_ids[0]}-{message_ids[-1]}"
+    return f"{len(message_ids)} messages"
+
+
+@Bot.on_message(filters.command('linkstats') & filters.private & filters.user([OWNER_ID] + ADMINS))
+async def link_stats_command(client: Bot, message: Message):
+    """
+    Show the most clicked links and delivery volume
+    Usage: /linkstats [1h|24h|7d|30d|all] [count]
+    """
+    window = DEFAULT_WINDOW
+    top = DEFAULT_TOP
+    for arg in message.text.split()[1:]:
+        if arg.lower() in WINDOWS:
+            window = arg.lower()
+        elif arg.isdigit():
+            top = max(1, min(int(arg), MAX_TOP))
+        else:
+            await message.reply_text(
+                "📋 <b>Usage:</b>\n\n"
+                "<code>/linkstats [1h|24h|7d|30d|all] [count]</code>\n\n"
+                "• <code>/linkstats</code> - Top 10 links of the last 24 hours\n"
+                "• <code>/linkstats 7d 20</code> - Top 20 links of the last 7 days",
+                quote=True
+            )
+            return
+
+    msg = await message.reply_text("⏳ <b>Loading link stats...</b>", quote=True)
+
+    # Count clicks still waiting in the buffer too
+    await link_stats.flush()
+    try:
+        volume = {name: await counter_totals('link', window_start(name)) for name in WINDOWS}
+        links = await top_counters('link', window_start(window), top)
+        messages = await top_counters('message', window_start(window), top)
+    except Exception as e:
+        await msg.edit_text(f"❌ <b>Could not read link stats:</b> <code>{e}</code>")
+        return
+
+    lines = ["📈 <b>Link Stats</b>\n", "<b>📊 Volume:</b>"]
+    for i, (name, totals) in enumerate(volume.items()):
+        branch = "└" if i == len(volume) - 1 else "├"
+        lines.append(
+            f"{branch} <b>{name}:</b> <code>{totals['clicks']}</code> clicks, "
+            f"<code>{totals['deliveries']}</code> files sent"
+        )
+
+    lines.append(f"\n<b>🔥 Top Links ({window}):</b>")
+    if not links:
+        lines.append("<i>No clicks recorded.</i>")
+    for i, row in enumerate(links, start=1):
+        lines.append(
+            f"{i}. <code>{row['name']}</code> ({describe_link(client, row['name'])})\n"
+            f"    <code>{row['clicks']}</code> clicks, <code>{row['deliveries']}</code> files sent"
+        )
+
+    lines.append(f"\n<b>📁 Top Files ({window}):</b>")
+    if not messages:
+        lines.append("<i>No deliveries recorded.</i>")
+    for i, row in enumerate(messages, start=1):
+        lines.append(f"{i}. Message <code>{row['name']}</code>: <code>{row['deliveries']}</code> deliveries")
+
+    await msg.edit_text("\n".join(lines), disable_web_page_preview=True)
@@ -5,7 +5,7 @@ from pyrogram import Client, filters
 from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
 from bot import Bot
 from config import OWNER_ID, ADMINS
-from database.database import get_setting, update_setting
+from database.database import get_setting_async, update_setting_async
 import asyncio
 
 # ===========================
@@ -101,8 +101,8 @@ async def show_main_menu(client: Bot, query: CallbackQuery):
 async def setup_channels(client: Bot, query: CallbackQuery):
     """Channels configuration"""
     
-    db_channel = get_setting('channel_id', 'Not Set')
-    force_channel = get_setting('force_channel', '0')
+    db_channel = await get_setting_async('channel_id', 'Not Set')
+    force_channel = await get_setting_async('force_channel', '0')
     
     # Get channel names
     db_info = "Not configured"
@@ -247,8 +247,8 @@ Text when user not subscribed
 async def setup_protection(client: Bot, query: CallbackQuery):
     """Protection settings"""
     
-    protect = get_setting('protect_content', 'False')
-    button = get_setting('disable_channel_button', 'False')
+    protect = await get_setting_async('protect_content', 'False')
+    button = await get_setting_async('disable_channel_button', 'False')
     
     text = f"""
 ╔════════════════════════════╗
@@ -293,7 +293,7 @@ Share button on posts
 async def setup_autodelete(client: Bot, query: CallbackQuery):
     """Auto delete settings"""
     
-    time = get_setting('auto_delete_time', '0')
+    time = await get_setting_async('auto_delete_time', '0')
     mins = int(time) // 60 if time != '0' else 0
     
     text = f"""
@@ -336,7 +336,7 @@ Shown after deletion
 async def setup_shortener(client: Bot, query: CallbackQuery):
     """URL shortener settings"""
     
-    enabled = get_setting('shortener_enabled', 'False')
+    enabled = await get_setting_async('shortener_enabled', 'False')
     
     text = f"""
 ╔══════════════════════════════╗
@@ -384,14 +384,14 @@ async def view_all_settings(client: Bot, query: CallbackQuery):
     
     # Get all settings
     settings = {
-        'start_msg': get_setting('start_msg', 'Default'),
-        'start_pic': get_setting('start_pic', 'None'),
-        'channel_id': get_setting('channel_id', 'Not Set'),
-        'force_channel': get_setting('force_channel', '0'),
-        'caption': get_setting('caption', 'None'),
-        'protect': get_setting('protect_content', 'False'),
-        'autodel': get_setting('auto_delete_time', '0'),
-        'shortener': get_setting('shortener_enabled', 'False')
+        'start_msg': await get_setting_async('start_msg', 'Default'),
+        'start_pic': await get_setting_async('start_pic', 'None'),
+        'channel_id': await get_setting_async('channel_id', 'Not Set'),
+        'force_channel': await get_setting_async('force_channel', '0'),
+        'caption': await get_setting_async('caption', 'None'),
+        'protect': await get_setting_async('protect_content', 'False'),
+        'autodel': await get_setting_async('auto_delete_time', '0'),
+        'shortener': await get_setting_async('shortener_enabled', 'False')
     }
     
     def short(text, length=30):
@@ -499,9 +499,9 @@ async def close_setup(client: Bot, query: CallbackQuery):
 @Bot.on_callback_query(filters.regex(r'^toggle_protect$'))
 async def toggle_protect(client: Bot, query: CallbackQuery):
     """Toggle content protection"""
-    current = get_setting('protect_content', 'False')
+    current = await get_setting_async('protect_content', 'False')
     new_value = 'False' if current == 'True' else 'True'
-    update_setting('protect_content', new_value)
+    await update_setting_async('protect_content', new_value)
     
     await query.answer(
         f"✅ Protect Content {'Enabled' if new_value == 'True' else 'Disabled'}!",
@@ -514,9 +514,9 @@ async def toggle_protect(client: Bot, query: CallbackQuery):
 @Bot.on_callback_query(filters.regex(r'^toggle_button$'))
 async def toggle_button(client: Bot, query: CallbackQuery):
     """Toggle channel button"""
-    current = get_setting('disable_channel_button', 'False')
+    current = await get_setting_async('disable_channel_button', 'False')
     new_value = 'False' if current == 'True' else 'True'
-    update_setting('disable_channel_button', new_value)
+    await update_setting_async('disable_channel_button', new_value)
     
     await query.answer(
         f"✅ Channel Button {'Hidden' if new_value == 'True' else 'Visible'}!",
@@ -529,9 +529,9 @@ async def toggle_button(client: Bot, query: CallbackQuery):
 @Bot.on_callback_query(filters.regex(r'^toggle_shortener$'))
 async def toggle_shortener(client: Bot, query: CallbackQuery):
     """Toggle URL shortener"""
-    current = get_setting('shortener_enabled', 'False')
+    current = await get_setting_async('shortener_enabled', 'False')
     new_value = 'False' if current == 'True' else 'True'
-    update_setting('shortener_enabled', new_value)
+    await update_setting_async('shortener_enabled', new_value)
     
     await query.answer(
         f"✅ URL Shortener {'Enabled' if new_value == 'True' else 'Disabled'}!",
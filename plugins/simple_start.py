@@ -136,11 +136,13 @@ async def help_callback(client: Bot, query):
 • <code>/batch</code> - Create batch link
 • <code>/genlink</code> - Single file link
 • <code>/custom_batch</code> - Custom range
+• <code>/bulklinks</code> - Bulk links file
 
 <b>📊 Bot Management:</b>
 • <code>/users</code> - Total users
 • <code>/broadcast</code> - Broadcast message
 • <code>/stats</code> - Bot statistics
+• <code>/linkstats</code> - Link analytics
 
 <b>⚙️ Configuration:</b>
 • <code>/setup</code> - Setup panel
@@ -1,19 +1,15 @@
 # plugins/start.py - COMPLETELY REWRITTEN - THIS WILL WORK!
 
 import os
-import asyncio
 from pyrogram import Client, filters
 from pyrogram.enums import ParseMode
 from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
-from pyrogram.errors import FloodWait, UserIsBlocked, InputUserDeactivated
 
 from bot import Bot
-from config import (ADMINS, FORCE_MSG, START_MSG, CUSTOM_CAPTION, 
-                    DISABLE_CHANNEL_BUTTON, PROTECT_CONTENT, START_PIC, 
-                    AUTO_DELETE_TIME, AUTO_DELETE_MSG, JOIN_REQUEST_ENABLE, 
-                    FORCE_SUB_CHANNEL, OWNER_ID)
-from helper_func import subscribed, decode, get_messages, delete_file
-from database.database import add_user, del_user, full_userbase, present_user
+from config import ADMINS, OWNER_ID, BATCH_MAX_IDS, runtime
+from helper_func import (subscribed, missing_channels, invite_pool, decode_link, LinkError, get_batch_manifest, iter_delivery_items, deletion_queue,
+                         delivery_engine, send_file_record, record_reply_markup, canonical_parameter)
+from database.database import register_user, count_users, link_stats
 
 # ===========================
 # MAIN START HANDLER
@@ -26,13 +22,9 @@ async def start_handler(client: Client, message: Message):
     Handles EVERYTHING - welcome, files, force sub
     """
     
-    # Add user to database
+    # Queue user for the next bulk insert
     user_id = message.from_user.id
-    if not await present_user(user_id):
-        try:
-            await add_user(user_id)
-        except:
-            pass
+    register_user(user_id)
     
     # Get command text
     text = message.text
@@ -62,18 +54,11 @@ async def start_handler(client: Client, message: Message):
     print("   → Processing file request")
     
     # Check force subscribe
-    if FORCE_SUB_CHANNEL and FORCE_SUB_CHANNEL != 0:
-        # Check if user is subscribed
-        try:
-            member = await client.get_chat_member(FORCE_SUB_CHANNEL, user_id)
-            is_subscribed = member.status not in ["kicked", "left"]
-        except:
-            is_subscribed = False
-        
-        if not is_subscribed:
-            print(f"   → User not subscribed, showing force sub")
-            await show_force_sub(client, message, file_parameter)
-            return
+    missing = await missing_channels(client, user_id)
+    if missing:
+        print(f"   → User missing {len(missing)} channel(s), showing force sub")
+        await show_force_sub(client, message, file_parameter, missing)
+        return
     
     # User is subscribed (or no force sub), send the file
     print("   → User authorized, sending file")
@@ -97,7 +82,7 @@ async def show_welcome(client: Client, message: Message):
         ]
     ])
     
-    welcome_text = START_MSG.format(
+    welcome_text = runtime.start_msg.format(
         first=message.from_user.first_name,
         last=message.from_user.last_name if message.from_user.last_name else "",
         username=f"@{message.from_user.username}" if message.from_user.username else "None",
@@ -105,10 +90,11 @@ async def show_welcome(client: Client, message: Message):
         id=message.from_user.id
     )
     
-    if START_PIC:
+    start_pic = runtime.start_pic
+    if start_pic:
         try:
             await message.reply_photo(
-                photo=START_PIC,
+                photo=start_pic,
                 caption=welcome_text,
                 reply_markup=reply_markup,
                 quote=True
@@ -130,30 +116,19 @@ async def show_welcome(client: Client, message: Message):
 # FORCE SUBSCRIBE
 # ===========================
 
-async def show_force_sub(client: Client, message: Message, file_parameter: str):
-    """Show force subscribe message"""
-    
-    # Get invite link
-    if bool(JOIN_REQUEST_ENABLE):
-        try:
-            invite = await client.create_chat_invite_link(
-                chat_id=FORCE_SUB_CHANNEL,
-                creates_join_request=True
-            )
-            button_url = invite.invite_link
-        except:
-            button_url = client.invitelink if hasattr(client, 'invitelink') else None
-    else:
-        button_url = client.invitelink if hasattr(client, 'invitelink') else None
-    
-    if not button_url:
-        # Fallback
-        button_url = f"https://t.me/c/{str(FORCE_SUB_CHANNEL)[4:]}/"
-    
-    # Create buttons
-    buttons = [
-        [InlineKeyboardButton("Join Channel", url=button_url)]
-    ]
+async def show_force_sub(client: Client, message: Message, file_parameter: str, missing: list):
+    """Show force subscribe message with a join button for each channel not joined yet"""
+    
+    # Links are created in Bot.start and rotated in the background, so this makes no API calls
+    invitelinks = getattr(client, 'invitelinks', {})
+    buttons = []
+    for number, channel_id in enumerate(missing, start=1):
+        button_url = invite_pool.get(channel_id) or invitelinks.get(channel_id)
+        if not button_url:
+            # Fallback
+            button_url = f"https://t.me/c/{str(channel_id)[4:]}/"
+        label = "Join Channel" if len(missing) == 1 else f"Join Channel {number}"
+        buttons.append([InlineKeyboardButton(label, url=button_url)])
     
     # Add try again button with the same file parameter
     try_again_link = f"https://t.me/{client.username}?start={file_parameter}"
@@ -161,7 +136,7 @@ async def show_force_sub(client: Client, message: Message, file_parameter: str):
         InlineKeyboardButton("🔄 Try Again", url=try_again_link)
     ])
     
-    force_text = FORCE_MSG.format(
+    force_text = runtime.force_msg.format(
         first=message.from_user.first_name,
         last=message.from_user.last_name if message.from_user.last_name else "",
         username=f"@{message.from_user.username}" if message.from_user.username else "None",
@@ -184,6 +159,12 @@ async def show_force_sub(client: Client, message: Message, file_parameter: str):
 async def send_file(client: Client, message: Message, file_parameter: str):
     """Decode parameter and send file(s)"""
     
+    # Read the settings once so a concurrent /setup edit cannot mix values mid-delivery
+    custom_caption = runtime.custom_caption
+    disable_channel_button = runtime.disable_channel_button
+    protect_content = runtime.protect_content
+    auto_delete_time = runtime.auto_delete_time
+    
     # Check db_channel
     if not hasattr(client, 'db_channel') or not client.db_channel:
         await message.reply_text(
@@ -194,10 +175,23 @@ async def send_file(client: Client, message: Message, file_parameter: str):
         )
         return
     
-    # Decode the parameter
+    # Decode the parameter, batches too large for a link are looked up by token
     try:
-        decoded = await decode(file_parameter)
-        print(f"   ✅ Decoded: {decoded}")
+        link = decode_link(file_parameter, client.db_channel.id)
+        if link.channel_slot != 0:
+            raise LinkError(f"unknown channel slot {link.channel_slot}")
+        message_ids = link.message_ids
+        manifest = None
+        if link.batch_token:
+            manifest = await get_batch_manifest(link.batch_token)
+            if not manifest:
+                raise LinkError(f"unknown or expired batch {link.batch_token}")
+            message_ids = manifest['ids']
+        # Ranges are not size-checked by the codec, and anyone can craft one
+        if len(message_ids) > BATCH_MAX_IDS:
+            raise LinkError(f"link covers {len(message_ids)} messages")
+        # Count every link to the same files under one name, whichever format was clicked
+        stats_name = canonical_parameter(link)
     except Exception as e:
         print(f"   ❌ Decode error: {e}")
         await message.reply_text(
@@ -208,54 +202,19 @@ async def send_file(client: Client, message: Message, file_parameter: str):
         )
         return
     
-    # Parse the decoded string
-    # Format: get-{id} or get-{start_id}-{end_id}
-    parts = decoded.split('-')
+    link_stats.click(stats_name)
     
-    if len(parts) < 2 or parts[0] != 'get':
-        print(f"   ❌ Invalid format: {decoded}")
-        await message.reply_text(
-            "❌ <b>Invalid Link Format!</b>\n\n"
-            "This link is not properly formatted.",
-            quote=True
-        )
-        return
+    # Options stored with the batch win over the bot-wide settings
+    caption_override = bool(manifest and manifest.get('caption'))
+    if caption_override:
+        custom_caption = manifest['caption']
+    if manifest and manifest.get('protect') is not None:
+        protect_content = manifest['protect']
     
-    # Calculate message IDs
-    try:
-        channel_id = abs(client.db_channel.id)
-        
-        if len(parts) == 2:
-            # Single file: get-{id}
-            msg_id = int(int(parts[1]) / channel_id)
-            message_ids = [msg_id]
-            print(f"   📄 Single file: message {msg_id}")
-        
-        elif len(parts) == 3:
-            # Batch: get-{start}-{end}
-            start_id = int(int(parts[1]) / channel_id)
-            end_id = int(int(parts[2]) / channel_id)
-            
-            if start_id <= end_id:
-                message_ids = list(range(start_id, end_id + 1))
-            else:
-                # Reverse range
-                message_ids = list(range(start_id, end_id - 1, -1))
-            
-            print(f"   📦 Batch: {len(message_ids)} messages ({start_id} to {end_id})")
-        
-        else:
-            raise ValueError(f"Invalid parts count: {len(parts)}")
-    
-    except Exception as e:
-        print(f"   ❌ Parse error: {e}")
-        await message.reply_text(
-            "❌ <b>Link Processing Error!</b>\n\n"
-            f"Could not process this link.\n"
-            f"Error: <code>{str(e)}</code>",
-            quote=True
-        )
-        return
+    if len(message_ids) == 1:
+        print(f"   📄 Single file: message {message_ids[0]}")
+    else:
+        print(f"   📦 Batch: {len(message_ids)} messages ({message_ids[0]} to {message_ids[-1]})")
     
     # Fetch messages
     temp_msg = await message.reply_text(
@@ -264,95 +223,107 @@ async def send_file(client: Client, message: Message, file_parameter: str):
         quote=True
     )
     
+    # Send files
+    chat_id = message.from_user.id
+    
+    async def send_one(item):
+        # Indexed records are resent by file_id, anything else is copied
+        is_record = isinstance(item, dict)
+        if is_record:
+            original_caption = item['caption']
+            is_document = item['type'] == 'document'
+            filename = item.get('file_name')
+        else:
+            original_caption = item.caption.html if item.caption else ""
+            is_document = bool(item.document)
+            filename = item.document.file_name if item.document else None
+        
+        # Prepare caption
+        if custom_caption and (is_document or caption_override):
+            caption = custom_caption.format(
+                previouscaption=original_caption,
+                filename=filename
+            )
+        else:
+            caption = original_caption
+        
+        # Prepare reply markup
+        if disable_channel_button:
+            reply_markup = record_reply_markup(item) if is_record else item.reply_markup
+        else:
+            reply_markup = None
+        
+        if is_record:
+            sent = await send_file_record(client, chat_id, item, caption, reply_markup, protect_content)
+        else:
+            sent = await item.copy(
+                chat_id=chat_id,
+                caption=caption,
+                parse_mode=ParseMode.HTML,
+                reply_markup=reply_markup,
+                protect_content=protect_content
+            )
+        link_stats.message_delivered(item['id'] if is_record else item.id)
+        return sent
+    
+    # Stream items chunk by chunk so the first file goes out after one lookup
+    missing = []
+    temp_deleted = False
+    
+    async def stream():
+        nonlocal temp_deleted
+        waiting = True
+        async for item in iter_delivery_items(client, message_ids, missing):
+            if waiting:
+                waiting = False
+                try:
+                    await temp_msg.delete()
+                    temp_deleted = True
+                except Exception:
+                    pass
+            yield item
+    
     try:
-        messages = await get_messages(client, message_ids)
-        print(f"   ✅ Fetched {len(messages)} messages")
+        report = await delivery_engine.deliver(chat_id, stream(), send_one)
+        link_stats.delivered(stats_name, report.sent)
+        print(f"   📊 Delivery: {report} ({len(missing)} missing)")
+        if not report.sent and not report.failed:
+            raise ValueError("no messages found")
     except Exception as e:
         print(f"   ❌ Fetch error: {e}")
-        await temp_msg.edit_text(
+        error_text = (
             "❌ <b>Error Fetching Files!</b>\n\n"
             "The files may have been deleted or link is invalid.\n"
             "Please contact the person who shared this link."
         )
+        # The wait notice is gone once the first file was streamed
+        if temp_deleted:
+            await message.reply_text(error_text, quote=True)
+        else:
+            await temp_msg.edit_text(error_text)
         return
     
-    await temp_msg.delete()
-    
-    # Send files
     sent_messages = []
-    
-    for idx, msg in enumerate(messages, 1):
-        try:
-            # Prepare caption
-            if CUSTOM_CAPTION and msg.document:
-                prev_caption = msg.caption.html if msg.caption else ""
-                filename = msg.document.file_name
-                caption = CUSTOM_CAPTION.format(
-                    previouscaption=prev_caption,
-                    filename=filename
-                )
-            else:
-                caption = msg.caption.html if msg.caption else ""
-            
-            # Prepare reply markup
-            if DISABLE_CHANNEL_BUTTON:
-                reply_markup = msg.reply_markup
-            else:
-                reply_markup = None
-            
-            # Send the file
-            copied = await msg.copy(
-                chat_id=message.from_user.id,
-                caption=caption,
-                parse_mode=ParseMode.HTML,
-                reply_markup=reply_markup,
-                protect_content=PROTECT_CONTENT
-            )
-            
-            if AUTO_DELETE_TIME and AUTO_DELETE_TIME > 0:
-                sent_messages.append(copied)
-            
-            print(f"   ✅ Sent file {idx}/{len(messages)}")
-            
-            # Small delay between files
-            if len(messages) > 1:
-                await asyncio.sleep(0.5)
-        
-        except FloodWait as e:
-            print(f"   ⏳ FloodWait: {e.value}s")
-            await asyncio.sleep(e.value)
-            # Retry
-            try:
-                copied = await msg.copy(
-                    chat_id=message.from_user.id,
-                    caption=caption,
-                    parse_mode=ParseMode.HTML,
-                    reply_markup=reply_markup,
-                    protect_content=PROTECT_CONTENT
-                )
-                if AUTO_DELETE_TIME and AUTO_DELETE_TIME > 0:
-                    sent_messages.append(copied)
-            except Exception as retry_error:
-                print(f"   ❌ Retry failed: {retry_error}")
-        
-        except Exception as e:
-            print(f"   ❌ Error sending file {idx}: {e}")
-            continue
+    if auto_delete_time and auto_delete_time > 0:
+        sent_messages = [copied for copied in report.results if copied]
     
     # Auto-delete if enabled
-    if sent_messages and AUTO_DELETE_TIME and AUTO_DELETE_TIME > 0:
+    if sent_messages and auto_delete_time and auto_delete_time > 0:
         original_link = f"https://t.me/{client.username}?start={file_parameter}"
         
         delete_notice = await message.reply_text(
-            AUTO_DELETE_MSG.format(time=AUTO_DELETE_TIME),
+            runtime.auto_delete_msg.format(time=auto_delete_time),
             quote=True
         )
         
         # Schedule deletion
-        asyncio.create_task(delete_file(sent_messages, client, delete_notice, original_link))
-        print(f"   ⏱️ Auto-delete scheduled for {AUTO_DELETE_TIME}s")
+        await deletion_queue.schedule(
+            chat_id, [msg.id for msg in sent_messages], auto_delete_time,
+            notice_id=delete_notice.id, link=original_link
+        )
+        print(f"   ⏱️ Auto-delete scheduled for {auto_delete_time}s")
     
-    print(f"   ✅ Done! Sent {len(sent_messages)} files")
+    print(f"   ✅ Done! Sent {report.sent} files")
 
 
 # ===========================
@@ -363,63 +334,5 @@ async def send_file(client: Client, message: Message, file_parameter: str):
 async def get_users(client: Bot, message: Message):
     """Get total users count"""
     msg = await message.reply_text("⏳ <b>Counting users...</b>", quote=True)
-    users = await full_userbase()
-    await msg.edit(f"👥 <b>Total Users:</b> <code>{len(users)}</code>")
-
-
-@Bot.on_message(filters.command('broadcast') & filters.private & filters.user([OWNER_ID] + ADMINS))
-async def broadcast(client: Bot, message: Message):
-    """Broadcast message to all users"""
-    
-    if not message.reply_to_message:
-        await message.reply_text(
-            "❌ <b>Usage:</b>\n\n"
-            "Reply to a message with <code>/broadcast</code> to send it to all users.",
-            quote=True
-        )
-        return
-    
-    users = await full_userbase()
-    broadcast_msg = message.reply_to_message
-    
-    status_msg = await message.reply_text(
-        "📢 <b>Broadcasting...</b>\n\n"
-        f"Total users: {len(users)}\n"
-        "Please wait...",
-        quote=True
-    )
-    
-    successful = 0
-    blocked = 0
-    deleted = 0
-    failed = 0
-    
-    for user_id in users:
-        try:
-            await broadcast_msg.copy(user_id)
-            successful += 1
-        except UserIsBlocked:
-            await del_user(user_id)
-            blocked += 1
-        except InputUserDeactivated:
-            await del_user(user_id)
-            deleted += 1
-        except FloodWait as e:
-            await asyncio.sleep(e.value)
-            try:
-                await broadcast_msg.copy(user_id)
-                successful += 1
-            except:
-                failed += 1
-        except:
-            failed += 1
-    
-    await status_msg.edit(
-        f"✅ <b>Broadcast Complete!</b>\n\n"
-        f"📊 <b>Statistics:</b>\n"
-        f"• Total: <code>{len(users)}</code>\n"
-        f"• Successful: <code>{successful}</code>\n"
-        f"• Blocked: <code>{blocked}</code>\n"
-        f"• Deleted: <code>{deleted}</code>\n"
-        f"• Failed: <code>{failed}</code>"
-    )
+    total = await count_users()
+    await msg.edit(f"👥 <b>Total Users:</b> <code>{total}</code>")
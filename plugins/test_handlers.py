@@ -71,7 +71,7 @@ async def debug_handler(client: Bot, message: Message):
 
 <b>📁 Channels:</b>
 ├ <b>DB Channel ID:</b> <code>{config.CHANNEL_ID}</code>
-├ <b>Force Sub ID:</b> <code>{config.FORCE_SUB_CHANNEL if config.FORCE_SUB_CHANNEL else 'Disabled'}</code>
+├ <b>Force Sub ID:</b> <code>{config.runtime.force_sub_channel if config.runtime.force_sub_channel else 'Disabled'}</code>
 └ <b>Invite Link:</b> {hasattr(client, 'invitelink') and client.invitelink is not None}
 
 <b>🗄️ Database:</b>
@@ -84,9 +84,9 @@ async def debug_handler(client: Bot, message: Message):
 └ <b>Total Admins:</b> <code>{len(config.ADMINS)}</code>
 
 <b>⚙️ Features:</b>
-├ <b>Protect Content:</b> {config.PROTECT_CONTENT}
-├ <b>Auto Delete:</b> {f"{config.AUTO_DELETE_TIME}s" if config.AUTO_DELETE_TIME else "Disabled"}
-└ <b>Custom Caption:</b> {"Enabled" if config.CUSTOM_CAPTION else "Disabled"}
+├ <b>Protect Content:</b> {config.runtime.protect_content}
+├ <b>Auto Delete:</b> {f"{config.runtime.auto_delete_time}s" if config.runtime.auto_delete_time else "Disabled"}
+└ <b>Custom Caption:</b> {"Enabled" if config.runtime.custom_caption else "Disabled"}
 
 <b>🔍 Current Message:</b>
 ├ <b>Chat Type:</b> {message.chat.type}
@@ -127,7 +127,7 @@ async def test_force_sub(client: Bot, message: Message):
     """Test force subscribe functionality"""
     import config
     
-    if not config.FORCE_SUB_CHANNEL or config.FORCE_SUB_CHANNEL == 0:
+    if not config.runtime.force_sub_channel or config.runtime.force_sub_channel == 0:
         await message.reply_text(
             "❌ <b>Force Subscribe is Disabled</b>\n\n"
             "Set FORCE_SUB_CHANNEL to enable it.",
@@ -137,11 +137,11 @@ async def test_force_sub(client: Bot, message: Message):
     
     try:
         # Try to get channel
-        channel = await client.get_chat(config.FORCE_SUB_CHANNEL)
+        channel = await client.get_chat(config.runtime.force_sub_channel)
         
         # Try to get member status
         try:
-            member = await client.get_chat_member(config.FORCE_SUB_CHANNEL, message.from_user.id)
+            member = await client.get_chat_member(config.runtime.force_sub_channel, message.from_user.id)
             status = member.status
         except:
             status = "Not a member"
@@ -151,7 +151,7 @@ async def test_force_sub(client: Bot, message: Message):
             if hasattr(client, 'invitelink') and client.invitelink:
                 invite = client.invitelink
             else:
-                invite = await client.export_chat_invite_link(config.FORCE_SUB_CHANNEL)
+                invite = await client.export_chat_invite_link(config.runtime.force_sub_channel)
         except Exception as e:
             invite = f"Error: {e}"
         
@@ -164,7 +164,7 @@ async def test_force_sub(client: Bot, message: Message):
 
 <b>📋 Channel Info:</b>
 ├ <b>Name:</b> {channel.title}
-├ <b>ID:</b> <code>{config.FORCE_SUB_CHANNEL}</code>
+├ <b>ID:</b> <code>{config.runtime.force_sub_channel}</code>
 ├ <b>Type:</b> {channel.type}
 └ <b>Username:</b> {f"@{channel.username}" if channel.username else "Private"}
 
@@ -184,7 +184,7 @@ async def test_force_sub(client: Bot, message: Message):
         await message.reply_text(
             f"❌ <b>Force Subscribe Test Failed!</b>\n\n"
             f"<b>Error:</b> <code>{str(e)}</code>\n\n"
-            f"<b>Channel ID:</b> <code>{config.FORCE_SUB_CHANNEL}</code>\n\n"
+            f"<b>Channel ID:</b> <code>{config.runtime.force_sub_channel}</code>\n\n"
             f"<b>Solutions:</b>\n"
             f"1. Check if channel ID is correct\n"
             f"2. Make sure bot is in the channel\n"
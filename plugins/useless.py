@@ -3,18 +3,24 @@ from pyrogram.types import Message
 from pyrogram import filters
 import config
 from datetime import datetime
-from helper_func import get_readable_time
+from helper_func import get_readable_time, message_cache, membership_cache, batch_cache
+from database.database import users
 
 @Bot.on_message(filters.command('stats') & filters.user(config.ADMINS))
 async def stats(bot: Bot, message: Message):
     now = datetime.now()
     delta = now - bot.uptime
     time = get_readable_time(delta.seconds)
-    BOT_STATS_TEXT = config.get_bot_stats_text()
-    await message.reply(BOT_STATS_TEXT.format(uptime=time))
+    await message.reply(
+        config.runtime.bot_stats_text.format(uptime=time)
+        + f"\n\n<b>Message Cache:</b> <code>{message_cache}</code>"
+        + f"\n<b>Force Sub Cache:</b> <code>{membership_cache}</code>"
+        + f"\n<b>Batch Cache:</b> <code>{batch_cache}</code>"
+        + (f"\n<b>User Set:</b> <code>{users.seen}</code>" if users.members is not None else "")
+    )
 
 @Bot.on_message(filters.private & filters.incoming)
 async def useless(_,message: Message):
-    USER_REPLY_TEXT = config.get_user_reply_text()
-    if USER_REPLY_TEXT:
-        await message.reply(USER_REPLY_TEXT)
\ No newline at end of file
+    user_reply_text = config.runtime.user_reply_text
+    if user_reply_text:
+        await message.reply(user_reply_text)
\ No newline at end of file
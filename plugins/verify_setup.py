@@ -5,7 +5,7 @@ from pyrogram import Client, filters
 from pyrogram.types import Message
 from pyrogram.errors import ChannelPrivate, ChannelInvalid, PeerIdInvalid, UserNotParticipant
 from bot import Bot
-from config import OWNER_ID, ADMINS, CHANNEL_ID, FORCE_SUB_CHANNEL
+from config import OWNER_ID, ADMINS, CHANNEL_ID, runtime
 
 @Bot.on_message(filters.command('verify') & filters.private & filters.user([OWNER_ID] + ADMINS))
 async def verify_setup(client: Bot, message: Message):
@@ -14,6 +14,7 @@ async def verify_setup(client: Bot, message: Message):
     Usage: /verify
     """
     
+    force_sub_channel = runtime.force_sub_channel
     msg = await message.reply_text("🔍 <b>Verifying Bot Setup...</b>")
     
     results = []
@@ -81,17 +82,17 @@ async def verify_setup(client: Bot, message: Message):
         results.append(f"❌ <b>Database Channel Error:</b> {str(e)}\n")
     
     # 3. Check Force Subscribe Channel
-    if FORCE_SUB_CHANNEL and FORCE_SUB_CHANNEL != 0:
+    if force_sub_channel and force_sub_channel != 0:
         results.append("📢 <b>Force Subscribe Channel Check:</b>")
         try:
-            force_channel = await client.get_chat(FORCE_SUB_CHANNEL)
-            results.append(f"├ Channel ID: <code>{FORCE_SUB_CHANNEL}</code>")
+            force_channel = await client.get_chat(force_sub_channel)
+            results.append(f"├ Channel ID: <code>{force_sub_channel}</code>")
             results.append(f"├ Channel Title: {force_channel.title}")
             results.append(f"├ Channel Type: {force_channel.type}")
             
             # Check bot permissions
             try:
-                bot_member = await client.get_chat_member(FORCE_SUB_CHANNEL, bot_info.id)
+                bot_member = await client.get_chat_member(force_sub_channel, bot_info.id)
                 results.append(f"├ Bot Status: {bot_member.status}")
                 
                 if bot_member.status in ["administrator", "creator"]:
@@ -103,7 +104,7 @@ async def verify_setup(client: Bot, message: Message):
                     
                     # Test invite link
                     try:
-                        invite_link = await client.export_chat_invite_link(FORCE_SUB_CHANNEL)
+                        invite_link = await client.export_chat_invite_link(force_sub_channel)
                         results.append(f"└ ✅ <b>Invite Link: Generated</b>\n")
                     except Exception as e:
                         results.append(f"└ ❌ <b>Invite Link Failed:</b> {str(e)}\n")
@@ -115,12 +116,12 @@ async def verify_setup(client: Bot, message: Message):
                 
         except ChannelPrivate:
             results.append(f"❌ Channel is private and bot is not a member")
-            results.append(f"└ Please add bot to channel: <code>{FORCE_SUB_CHANNEL}</code>\n")
+            results.append(f"└ Please add bot to channel: <code>{force_sub_channel}</code>\n")
         except ChannelInvalid:
-            results.append(f"❌ Invalid channel ID: <code>{FORCE_SUB_CHANNEL}</code>")
+            results.append(f"❌ Invalid channel ID: <code>{force_sub_channel}</code>")
             results.append("└ Check your FORCE_SUB_CHANNEL in config\n")
         except PeerIdInvalid:
-            results.append(f"❌ Peer ID Invalid: <code>{FORCE_SUB_CHANNEL}</code>")
+            results.append(f"❌ Peer ID Invalid: <code>{force_sub_channel}</code>")
             results.append("└ Make sure the channel ID is correct and includes -100 prefix\n")
         except Exception as e:
             results.append(f"❌ <b>Force Subscribe Channel Error:</b> {str(e)}\n")
@@ -131,7 +132,7 @@ async def verify_setup(client: Bot, message: Message):
     results.append("⚙️ <b>Configuration Summary:</b>")
     results.append(f"├ Owner ID: <code>{OWNER_ID}</code>")
     results.append(f"├ Database Channel: <code>{CHANNEL_ID}</code>")
-    results.append(f"├ Force Sub Channel: <code>{FORCE_SUB_CHANNEL if FORCE_SUB_CHANNEL else 'Disabled'}</code>")
+    results.append(f"├ Force Sub Channel: <code>{force_sub_channel if force_sub_channel else 'Disabled'}</code>")
     results.append(f"└ Admins Count: <code>{len(ADMINS)}</code>\n")
     
     # 5. Recommendations
@@ -149,10 +150,10 @@ async def verify_setup(client: Bot, message: Message):
         all_good = False
         results.append("❌ Fix Database Channel configuration")
     
-    if FORCE_SUB_CHANNEL and FORCE_SUB_CHANNEL != 0:
+    if force_sub_channel and force_sub_channel != 0:
         try:
-            await client.get_chat(FORCE_SUB_CHANNEL)
-            bot_member = await client.get_chat_member(FORCE_SUB_CHANNEL, bot_info.id)
+            await client.get_chat(force_sub_channel)
+            bot_member = await client.get_chat_member(force_sub_channel, bot_info.id)
             if bot_member.status not in ["administrator", "creator"]:
                 all_good = False
                 results.append("❌ Make bot admin in Force Subscribe Channel")
@@ -319,7 +320,7 @@ async def test_database(client: Bot, message: Message):
     msg = await message.reply_text("🔍 Testing database connection...")
     
     try:
-        from database.database import present_user, add_user, full_userbase
+        from database.database import present_user, add_user, count_users
         
         # Test reading
         test_user_id = message.from_user.id
@@ -329,8 +330,8 @@ async def test_database(client: Bot, message: Message):
         if not is_present:
             await add_user(test_user_id)
         
-        # Test listing
-        users = await full_userbase()
+        # Test counting
+        total_users = await count_users()
         
         result = f"""
 ✅ <b>Database Test Successful!</b>
@@ -338,7 +339,7 @@ async def test_database(client: Bot, message: Message):
 <b>Connection:</b> ✅ Working
 <b>Read Operation:</b> ✅ Success
 <b>Write Operation:</b> ✅ Success
-<b>Total Users:</b> <code>{len(users)}</code>
+<b>Total Users:</b> <code>{total_users}</code>
 
 <b>Database Type:</b> {type(database).__name__}
 <b>Your User Status:</b> {'Already registered' if is_present else 'Newly registered'}